@@ -0,0 +1,69 @@
+"""
+Testing engine benchmark: thread engine against async engine.
+
+Points the scraper at SOURCES playlists of 200 links each on the local mock
+origin (mock_origin.py; a third of the links work, every stream request
+takes --latency seconds) with the web scrapers and GitHub discovery
+disabled, and times scrape_links("sports", ...) once per engine, first
+testing every link and then stopping at --target working links. All links
+are on one host, so the per-host limits are off: the engines are measured,
+not the politeness limiter.
+
+    python benchmarks/bench_engines.py [--engines thread async] [--sources 25] [--target 200] [--latency 0.1]
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import mock_origin  # noqa: E402
+from iptv_scraper.cli import IPTVScraper  # noqa: E402
+
+
+WEB_SCRAPERS = [
+    'search_github_repos', 'scrape_albaplayer_channels', 'scrape_match_streaming_sites', 'scrape_iptv_cat',
+    'scrape_live_tv_websites', 'scrape_pastebin_sites', 'scan_ip_range_for_streams',
+]
+
+
+def run(engine, sources, target, concurrency):
+    scraper = IPTVScraper(
+        use_cache=False, engine=engine, async_concurrency=concurrency, host_limit=0, host_rate=0
+    )
+    scraper.get_all_sources = lambda: list(sources)
+    for name in WEB_SCRAPERS:
+        setattr(scraper, name, lambda *args, **kwargs: [])
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        working = scraper.scrape_links('sports', target)
+    return time.perf_counter() - start, working, scraper.total_tested
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[0])
+    parser.add_argument('--engines', nargs='+', default=['thread', 'async'], choices=['thread', 'async'])
+    parser.add_argument('--sources', type=int, default=25, help='playlists of 200 links (default 25)')
+    parser.add_argument('--target', type=int, default=200, help='working links for the early-stop run')
+    parser.add_argument('--latency', type=float, default=0.1, help='seconds per stream request (default 0.1)')
+    parser.add_argument('--async-concurrency', type=int, default=500)
+    args = parser.parse_args()
+
+    _, port = mock_origin.start(latency=args.latency)
+    sources = mock_origin.source_urls(port, args.sources)
+    total = args.sources * mock_origin.ENTRIES_PER_SOURCE
+    print(f"{'run':28} {'engine':8} {'working':>8} {'tested':>8} {'time':>8}")
+    for label, target in [(f'test all {total:,} links', total), (f'stop at {args.target} working', args.target)]:
+        for engine in args.engines:
+            elapsed, working, tested = run(engine, sources, target, args.async_concurrency)
+            print(f"{label:28} {engine:8} {working:>8,} {tested:>8,} {elapsed:>7.1f}s")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,110 @@
+"""
+Search matcher benchmark: the original per-line loop against the block matcher.
+
+Builds a synthetic playlist of 500,000 entries (1M lines) and, for each
+query, times the loop source collection used before TermMatcher (split,
+strip and test every expanded term on every line) against
+parse_m3u_blocks() with the query's TermMatcher over 1 MB chunks, without
+attributes as source collection runs it. Both must find the same URLs.
+
+The hit sweep on its own is also timed both ways over the lowercased
+playlist: TermMatcher.hits() (one str.find() pass per term) against a
+single pass of a regex alternation of the terms. Best of three runs.
+
+    python benchmarks/bench_matcher.py [QUERY ...]
+"""
+
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from iptv_scraper.m3u import iter_entry_blocks, parse_m3u_blocks  # noqa: E402
+from iptv_scraper.search import TermMatcher, expand_search_terms  # noqa: E402
+
+
+QUERIES = ['zdf', 'football', 'kids', 'cnn', 'sports']
+
+CHANNELS = [
+    'CNN', 'BBC News', 'Rai 1', 'TF1', 'Canal+', 'Al Jazeera', 'MBC 2', 'Cartoon Network', 'Discovery',
+    'HBO', 'Sky Sports Main Event', 'ESPN 2', 'Fox News', 'Bein Sports 1', 'Euronews', 'RTL', 'ZDF',
+    'Arte', 'Disney Junior', 'Eurosport 2', 'beIN SPORTS HD',
+]
+
+
+def build_playlist(entries=500000):
+    random.seed(1)
+    lines = ['#EXTM3U']
+    for i in range(entries):
+        lines.append('#EXTINF:-1 tvg-id="c%d" group-title="General",%s %d' % (i, random.choice(CHANNELS), i % 97))
+        lines.append('http://cdn%d.example-host.net/live/%d/index.m3u8?token=%x' % (i % 50, i, i * 7919))
+    return '\n'.join(lines) + '\n'
+
+
+def line_loop(text, terms):
+    """Source collection as it was before TermMatcher"""
+    found = []
+    title = ''
+    for line in text.split('\n'):
+        line = line.strip()
+        if line.startswith('#EXTINF'):
+            title = line.split(',')[-1].strip() if ',' in line else ''
+        elif line and not line.startswith('#') and line.startswith(('http', 'rtmp')):
+            combined = (title + ' ' + line).lower()
+            for term in terms:
+                if term in combined:
+                    found.append(line)
+                    break
+            title = ''
+    return found
+
+
+def block_matcher(text, terms):
+    chunks = (text[i:i + (1 << 20)] for i in range(0, len(text), 1 << 20))
+    entries = parse_m3u_blocks(iter_entry_blocks(chunks), TermMatcher(terms), with_attributes=False)
+    return [entry.url for entry in entries]
+
+
+def alternation_hits(text, matcher):
+    pattern = re.compile('|'.join(re.escape(term) for term in matcher.terms))
+    return [match.start() for match in pattern.finditer(text)]
+
+
+def best_of(runs, function, *args):
+    best = None
+    for _ in range(runs):
+        start = time.perf_counter()
+        result = function(*args)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def main():
+    text = build_playlist()
+    lowered = text.lower()
+    print(f"{'query':10} {'matches':>8} {'line loop':>10} {'block':>8} {'speedup':>8}"
+          f" {'find sweeps':>12} {'alternation':>12}")
+    for query in sys.argv[1:] or QUERIES:
+        terms = expand_search_terms(query)
+        old_time, old = best_of(3, line_loop, text, terms)
+        new_time, new = best_of(3, block_matcher, text, terms)
+        if old != new:
+            print(f"{query}: results differ ({len(old)} vs {len(new)})")
+            return 1
+        matcher = TermMatcher(terms)
+        find_time, find_hits = best_of(3, matcher.hits, lowered)
+        alternation_time, alternation = best_of(3, alternation_hits, lowered, matcher)
+        if find_hits != alternation:
+            print(f"{query}: hit sweeps differ ({len(find_hits)} vs {len(alternation)})")
+            return 1
+        print(f"{query:10} {len(new):>8,} {old_time:>9.2f}s {new_time:>7.2f}s {old_time / new_time:>7.1f}x"
+              f" {find_time:>11.2f}s {alternation_time:>11.2f}s")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,106 @@
+"""
+Local mock origin for the benchmarks: M3U sources and HLS streams.
+
+Serves on 127.0.0.2 (127.0.0.1 and localhost links are filtered out by the
+scraper):
+
+    /src/<k>/list.m3u         playlist of ENTRIES_PER_SOURCE "Sports <k>-<i>" channels
+    /hls/good/<id>/...        master playlist with two variants, a live media
+                              playlist and MPEG-TS segments
+    /hls/html/<id>/...        playlist whose segments are an HTML page
+    anything else             404 (the "dead" links)
+
+Every /hls/ request waits `latency` seconds first, like a distant CDN.
+"""
+
+import http.server
+import socketserver
+import threading
+import time
+from urllib.parse import urlparse
+
+
+HOST = '127.0.0.2'
+ENTRIES_PER_SOURCE = 200
+
+MASTER = (
+    '#EXTM3U\n'
+    '#EXT-X-STREAM-INF:BANDWIDTH=5000000,RESOLUTION=1920x1080\nhi/media.m3u8\n'
+    '#EXT-X-STREAM-INF:BANDWIDTH=800000,RESOLUTION=640x360\nlo/media.m3u8\n'
+) + '#' * 600
+HTML_PLAYLIST = '#EXTM3U\n#EXTINF:2.0,\nseg1.ts\n' + '#' * 600
+TS_SEGMENT = (b'\x47' + bytes(187)) * 200
+
+
+def source_body(k, port):
+    """Playlist of source k: a third of the links good, a third dead, a third HTML"""
+    lines = ['#EXTM3U']
+    for i in range(ENTRIES_PER_SOURCE):
+        kind = ('good', 'dead', 'html')[i % 3]
+        lines.append('#EXTINF:-1 group-title="Sports",Sports %d-%d' % (k, i))
+        lines.append('http://%s:%d/hls/%s/%d_%d/index.m3u8' % (HOST, port, kind, k, i))
+    return '\n'.join(lines) + '\n'
+
+
+class OriginHandler(http.server.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, *args):
+        pass
+
+    def send(self, code, body, content_type='text/plain'):
+        if isinstance(body, str):
+            body = body.encode()
+        self.send_response(code)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        if self.command != 'HEAD':
+            self.wfile.write(body)
+
+    def do_HEAD(self):
+        self.do_GET()
+
+    def do_GET(self):
+        path = urlparse(self.path).path
+        parts = path.split('/')
+        if path.startswith('/src/') and parts[2].isdigit():
+            return self.send(200, source_body(int(parts[2]), self.server.server_address[1]), 'audio/x-mpegurl')
+        if path.startswith('/hls/'):
+            time.sleep(self.server.latency)
+        if path.startswith('/hls/good/'):
+            if path.endswith('index.m3u8'):
+                return self.send(200, MASTER, 'application/vnd.apple.mpegurl')
+            if path.endswith('media.m3u8'):
+                seq = int(time.time() / 2)
+                return self.send(200, (
+                    '#EXTM3U\n#EXT-X-TARGETDURATION:2\n#EXT-X-MEDIA-SEQUENCE:%d\n'
+                    '#EXTINF:2.0,\nseg%d.ts\n#EXTINF:2.0,\nseg%d.ts\n' % (seq, seq, seq + 1)
+                ), 'application/vnd.apple.mpegurl')
+            if path.endswith('.ts'):
+                return self.send(200, TS_SEGMENT, 'video/mp2t')
+        if path.startswith('/hls/html/'):
+            if path.endswith('index.m3u8'):
+                return self.send(200, HTML_PLAYLIST, 'application/vnd.apple.mpegurl')
+            return self.send(200, 'G<html>' + 'x' * 40000, 'video/mp2t')
+        return self.send(404, 'not found' + ' ' * 600)
+
+
+class OriginServer(socketserver.ThreadingMixIn, http.server.HTTPServer):
+    daemon_threads = True
+    request_queue_size = 512
+
+    def handle_error(self, request, client_address):
+        pass  # Probes hang up as soon as they have seen enough of a segment
+
+
+def start(port=0, latency=0.1):
+    """Serve in a background thread; returns (server, port)"""
+    server = OriginServer((HOST, port), OriginHandler)
+    server.latency = latency
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, server.server_address[1]
+
+
+def source_urls(port, count):
+    return ['http://%s:%d/src/%d/list.m3u' % (HOST, port, k) for k in range(count)]
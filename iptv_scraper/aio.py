@@ -0,0 +1,388 @@
+"""
+asyncio link tester (``--engine async``).
+
+Runs the same checks as ``IPTVScraper.test_iptv_link`` (they live in
+``iptv_scraper.validate``) with thousands of probes in flight on one event
+loop thread instead of one OS thread per probe. Requires aiohttp
+(``pip install iptv-scraper[async]``).
+"""
+
+import asyncio
+import concurrent.futures
+import queue
+import time
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+from iptv_scraper import validate
+from iptv_scraper.scheduler import screened
+
+
+# Threads for the link bookkeeping (dedup claims, result cache, domain
+# stats): SQLite and lock work that must not stall the event loop
+BOOKKEEPING_WORKERS = 4
+
+# Links taken off the queue and prechecked together in one bookkeeping job
+PRECHECK_BATCH = 64
+
+
+class AsyncLinkTester:
+    """Validate stream links concurrently over one shared aiohttp connection pool.
+
+    Link bookkeeping (deduplication, result cache, domain stats) goes through
+    the owning IPTVScraper, exactly as for its thread workers, on a few
+    bookkeeping threads so the event loop never waits on SQLite or a lock.
+    """
+    def __init__(self, scraper, concurrency=500, timeout=5):
+        if aiohttp is None:
+            raise RuntimeError('the async engine needs aiohttp (pip install "iptv-scraper[async]")')
+        self.scraper = scraper
+        self.concurrency = max(1, concurrency)
+        self.timeout = timeout
+        self.playlist_fetches = {}  # url -> nested playlist fetch in flight on the loop
+
+    def _record(self, domain, success):
+        self.scraper._update_domain_stats(domain, success)
+
+    def _precheck(self, batch):
+        """Run IPTVScraper._precheck_link over a batch of links (bookkeeping thread)"""
+        checked = []
+        for link_data in batch:
+            details = {}
+            verdict = None if link_data.get('screened') else self.scraper._precheck_link(link_data['url'], details)
+            checked.append((verdict, details))
+        return checked
+
+    def _timeout(self, timeout):
+        # Same meaning as a requests timeout: connect and per-read limits
+        return aiohttp.ClientTimeout(total=None, sock_connect=timeout, sock_read=timeout)
+
+    async def _read(self, response, limit, timer=None):
+        """Read up to limit bytes of a response body"""
+        data = bytearray()
+        while len(data) < limit:
+            chunk = await response.content.read(limit - len(data))
+            if not chunk:
+                break
+            data += chunk
+            if timer is not None:
+                timer.data(len(chunk))
+        return bytes(data)
+
+    def _passed(self, details, timer, bitrate=None):
+        if details is not None:
+            details['metrics'] = timer.metrics(bitrate)
+        return True, 'ok'
+
+    async def probe(self, session, link, domain=None, level='standard', details=None):
+        """Check one link; mirrors IPTVScraper._probe_link step by step.
+
+        level is one of validate.LEVELS. Returns (ok, reason) like the
+        thread engine and fills details with the renditions and metrics the
+        same way.
+        """
+        timeout = self._timeout(self.timeout)
+        timer = validate.StreamTimer()
+        try:
+            async with session.get(link, timeout=timeout, allow_redirects=True) as response:
+                timer.response()
+                if response.status != 200:
+                    self._record(domain, False)
+                    return False, f'http-{response.status}'
+
+                content_type = response.headers.get('content-type', '').lower()
+                if validate.too_small(response.headers.get('content-length', '0')):
+                    self._record(domain, False)
+                    return False, 'too-small'
+
+                if validate.is_playlist(link, content_type):
+                    probe_bytes = validate.QUICK_PROBE_BYTES if level == 'quick' else validate.PLAYLIST_PROBE_BYTES
+                    content = (await self._read(response, probe_bytes)).decode('utf-8', errors='ignore')
+                    variants = validate.playlist_variants(link, content)
+                    if variants and details is not None:
+                        details['renditions'] = variants
+                        details['rendition'] = variants[0]
+
+                    if level == 'quick':
+                        return self._passed(details, timer) if validate.playlist_header_ok(content) else (False, 'bad-playlist')
+
+                    stream_urls = validate.playlist_stream_urls(link, content)
+                    if not stream_urls:
+                        return False, 'bad-playlist'
+                    test_url = variants[0]['url'] if variants else stream_urls[0]
+                    ok, reason = await self._probe_segment(session, domain, link, content, test_url, level, timer)
+                    if not ok:
+                        return ok, reason
+                    return self._passed(details, timer, variants[0]['bandwidth'] if variants else None)
+
+                if validate.is_direct_stream(content_type):
+                    if level == 'quick':
+                        return self._passed(details, timer)
+                    probe_bytes = validate.DIRECT_STREAM_PROBE_BYTES
+                    if self.scraper.rank:
+                        probe_bytes = max(probe_bytes, validate.THROUGHPUT_PROBE_BYTES)
+                    timer.data_response()
+                    data = await self._read(response, probe_bytes, timer)
+                    success = len(data) >= validate.DIRECT_STREAM_MIN_BYTES
+                    self._record(domain, success)
+                    return self._passed(details, timer) if success else (False, 'stream-short')
+
+                self._record(domain, False)
+                return False, 'not-a-stream'
+        except asyncio.CancelledError:
+            raise
+        except asyncio.TimeoutError:
+            return False, 'timeout'
+        except aiohttp.ClientConnectionError:
+            return False, 'connection-error'
+        except Exception:
+            return False, 'error'
+
+    async def _fetch_playlist(self, session, url):
+        """Get (status, text) of a nested playlist through the scraper's playlist cache.
+
+        Probes asking for a URL that is already being fetched await that
+        fetch instead of sending their own request.
+        """
+        cache = self.scraper.playlist_cache
+        fetch = self.playlist_fetches.get(url)
+        if fetch is None:
+            cached = cache.get(url)
+            if cached is not None:
+                return cached
+            fetch = self.playlist_fetches[url] = asyncio.ensure_future(self._get_playlist(session, url))
+            fetch.add_done_callback(lambda done: self._playlist_fetched(url, done))
+        else:
+            cache.count_coalesced()
+        # A probe cancelled while waiting must not cancel the fetch others wait for
+        return await asyncio.shield(fetch)
+
+    async def _get_playlist(self, session, url):
+        async with session.get(url, timeout=self._timeout(5)) as response:
+            if response.status != 200:
+                result = response.status, ''
+            else:
+                result = 200, (await response.read()).decode('utf-8', errors='replace')
+        self.scraper.playlist_cache.put(url, result)
+        return result
+
+    def _playlist_fetched(self, url, fetch):
+        del self.playlist_fetches[url]
+        if not fetch.cancelled():
+            fetch.exception()  # Retrieved here in case every waiter was cancelled
+
+    async def _probe_segment(self, session, domain, media_url, media_content, test_url, level, timer):
+        timeout = self._timeout(5)
+
+        # Nested playlist: go one level deeper
+        if validate.is_playlist_url(test_url):
+            try:
+                status, text = await self._fetch_playlist(session, test_url)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                return False, 'nested-error'
+            if status != 200:
+                return False, f'nested-http-{status}'
+            media_url, media_content = test_url, text
+            test_url = validate.nested_segment_url(test_url, media_content)
+            if test_url is None:
+                return False, 'bad-nested-playlist'
+
+        try:
+            async with session.get(test_url, timeout=timeout) as response:
+                timer.data_response()
+                if response.status != 200:
+                    return False, f'segment-http-{response.status}'
+                if not validate.segment_content_type_ok(response.headers.get('content-type', '').lower()):
+                    return False, 'segment-not-video'
+
+                ok, reason = await self._inspect_segment(response, test_url, timer)
+                if not ok:
+                    if reason == 'segment-short':
+                        self._record(domain, False)
+                    return False, reason
+
+                # Ranking compares throughput, which needs more than the first packets
+                if self.scraper.rank:
+                    await self._read_on(response, timer)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            return False, 'segment-error'
+
+        if level == 'deep':
+            ok, reason = await self._check_playlist_advances(session, media_url, media_content)
+            if not ok:
+                self._record(domain, False)
+                return False, reason
+
+        self._record(domain, True)
+        return True, 'ok'
+
+    async def _inspect_segment(self, response, segment_url, timer):
+        """Read a segment response into a validate.SegmentInspector until it decides"""
+        inspector = validate.SegmentInspector(segment_url)
+        while True:
+            space = inspector.space()
+            data = await response.content.read(len(space))
+            space[:len(data)] = data
+            timer.data(len(data))
+            verdict = inspector.feed(len(data))
+            if verdict is not None:
+                return verdict
+
+    async def _read_on(self, response, timer):
+        """Keep reading a working segment until THROUGHPUT_PROBE_BYTES in all, to measure its throughput"""
+        try:
+            while timer.received < validate.THROUGHPUT_PROBE_BYTES:
+                data = await response.content.read(validate.SEGMENT_READ_STEP)
+                if not data:
+                    break
+                timer.data(len(data))
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            pass  # The link is already judged; the measurement just ends early
+
+    async def _check_playlist_advances(self, session, playlist_url, content):
+        """Deep validation: reload a live media playlist until it moves on (twice at most)"""
+        if not validate.is_live_playlist(content):
+            return True, 'ok'  # VOD or an ended event: complete, nothing to advance
+
+        for _ in range(2):
+            await asyncio.sleep(validate.reload_delay(content))
+            try:
+                async with session.get(playlist_url, timeout=self._timeout(5)) as response:
+                    if response.status != 200:
+                        return False, f'reload-http-{response.status}'
+                    reloaded = (await response.read()).decode('utf-8', errors='replace')
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                return False, 'reload-error'
+
+            if validate.playlist_advanced(content, reloaded):
+                return True, 'ok'
+        return False, 'stale-playlist'
+
+    def drain(self, link_queue, collection_done, should_stop, on_result):
+        """Test links from a thread queue until it is drained or should_stop() is true.
+
+        Blocks the calling thread, which runs the event loop.
+        ``on_result(link_data, ok[, details])`` is called from the loop thread
+        for every link taken off the queue, as the thread workers do (details
+        holds the renditions of a probed master playlist), and every link is
+        handed back with ``link_queue.done()`` once its probe is over.
+        """
+        loop = asyncio.new_event_loop()
+        try:
+            loop.run_until_complete(self._drain(link_queue, collection_done, should_stop, on_result))
+        finally:
+            loop.close()
+
+    async def _drain(self, link_queue, collection_done, should_stop, on_result):
+        scraper = self.scraper
+        loop = asyncio.get_event_loop()
+        bookkeeping = concurrent.futures.ThreadPoolExecutor(BOOKKEEPING_WORKERS)
+        connector = aiohttp.TCPConnector(limit=self.concurrency, ssl=False)
+        in_flight = set()
+        recording = set()  # _record_result calls still running on the bookkeeping threads
+
+        async def run(link_data):
+            url = link_data['url']
+            # Two-pass validation: unscreened links only get a quick probe
+            screening = scraper.two_pass and not link_data.get('screened')
+            level = 'quick' if screening else scraper.validation
+            deadline = validate.PROBE_DEADLINE + (2 * validate.RELOAD_WAIT_MAX if level == 'deep' else 0)
+            details = {}
+            started = time.time()
+            try:
+                ok, reason = await asyncio.wait_for(
+                    self.probe(session, url, scraper._extract_domain(url), level, details), deadline)
+            except asyncio.TimeoutError:
+                ok, reason = False, 'timeout'
+            except asyncio.CancelledError:
+                # Cut off on stop, says nothing about the link: a later run
+                # sharing the --dedup-file still has to test it
+                scraper.checked_urls.discard(url)
+                raise
+            finally:
+                link_queue.done(link_data)
+            if screening and ok:
+                link_queue.requeue(screened(link_data))
+                return
+            record = loop.run_in_executor(
+                bookkeeping, scraper._record_result, url, ok, reason, time.time() - started, level, details)
+            recording.add(record)
+            record.add_done_callback(recording.discard)
+            # A stop must not lose the result of a link that was probed
+            await asyncio.shield(record)
+            if not should_stop():
+                on_result(link_data, ok, details)
+
+        async with aiohttp.ClientSession(connector=connector, headers=validate.STREAM_HEADERS) as session:
+            try:
+                while not should_stop():
+                    if len(in_flight) >= self.concurrency:
+                        await asyncio.wait(in_flight, timeout=0.2, return_when=asyncio.FIRST_COMPLETED)
+                        continue
+
+                    try:
+                        link_data = link_queue.get_nowait()
+                    except queue.Empty:
+                        # Probes still running may hand back two-pass survivors
+                        if collection_done.is_set() and link_queue.empty() and not in_flight:
+                            break
+                        # The queue is fed by source threads; poll it without blocking the loop
+                        if in_flight:
+                            await asyncio.wait(in_flight, timeout=0.05, return_when=asyncio.FIRST_COMPLETED)
+                        else:
+                            await asyncio.sleep(0.05)
+                        continue
+
+                    batch = [link_data]
+                    while len(batch) < PRECHECK_BATCH and len(in_flight) + len(batch) < self.concurrency:
+                        try:
+                            batch.append(link_queue.get_nowait())
+                        except queue.Empty:
+                            break
+
+                    checked = await loop.run_in_executor(bookkeeping, self._precheck, batch)
+                    for link_data, (verdict, details) in zip(batch, checked):
+                        if verdict is not None:
+                            link_queue.done(link_data)
+                            on_result(link_data, verdict, details)
+                            continue
+                        if should_stop():
+                            # Claimed but never probed: a later run sharing
+                            # the --dedup-file still has to test it
+                            link_queue.done(link_data)
+                            scraper.checked_urls.discard(link_data['url'])
+                            continue
+
+                        task = asyncio.ensure_future(run(link_data))
+                        in_flight.add(task)
+                        task.add_done_callback(in_flight.discard)
+
+                # Let the remaining probes finish unless we are stopping early
+                while in_flight and not should_stop():
+                    await asyncio.wait(in_flight, timeout=0.2)
+            finally:
+                # A task cancelled before its first step never runs run()'s cleanup
+                await asyncio.sleep(0)
+                for task in in_flight:
+                    task.cancel()
+                if in_flight:
+                    await asyncio.gather(*in_flight, return_exceptions=True)
+                fetches = list(self.playlist_fetches.values())
+                for fetch in fetches:
+                    fetch.cancel()
+                if fetches:
+                    await asyncio.gather(*fetches, return_exceptions=True)
+                if recording:
+                    await asyncio.gather(*recording, return_exceptions=True)
+                bookkeeping.shutdown(wait=False)
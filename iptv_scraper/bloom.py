@@ -0,0 +1,212 @@
+"""
+Memory-bounded set of seen URLs for very large runs (``--compact-dedup``).
+
+An all-channels search over every aggregate source claims hundreds of
+thousands of URLs, and keeping each one as a string in a set costs hundreds
+of megabytes. ``CompactURLSet`` keeps a Bloom filter sized from the expected
+number of candidates in memory (about 1.8 MB per million URLs at a 0.1%
+false-positive rate) and 16-byte digests of the URLs in SQLite on disk.
+Every URL the filter has not seen is new for certain, so the disk is only
+read on a filter hit, and a false positive there never causes a link to be
+skipped. Given a path, the set outlives the run: claims made by earlier runs
+hold for a limited time, and links the caller forgets with forget_later()
+(the ones that worked) are only claimed until the end of the run.
+"""
+
+import hashlib
+import math
+import sqlite3
+import threading
+import time
+
+
+def url_digest(url):
+    """16-byte digest identifying a URL in the filter and the exact store"""
+    return hashlib.blake2b(url.encode('utf-8', 'surrogatepass'), digest_size=16).digest()
+
+
+class BloomFilter:
+    """Bloom filter over url_digest() values.
+
+    Sized for capacity items at error_rate false positives; the bit
+    positions are derived from the digest by double hashing.
+    """
+    def __init__(self, capacity, error_rate=0.001, bits=None):
+        self.capacity = max(1, int(capacity))
+        self.error_rate = error_rate
+        self.size = max(8, int(math.ceil(-self.capacity * math.log(error_rate) / math.log(2) ** 2)))
+        self.hashes = max(1, int(round(self.size / self.capacity * math.log(2))))
+        self.bits = bytearray((self.size + 7) // 8) if bits is None else bytearray(bits)
+
+    def _positions(self, digest):
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hashes)]
+
+    def add(self, digest):
+        """Set the digest's bits; True if any was unset (the item is certainly new)"""
+        bits = self.bits
+        new = False
+        for position in self._positions(digest):
+            mask = 1 << (position & 7)
+            if not bits[position >> 3] & mask:
+                bits[position >> 3] |= mask
+                new = True
+        return new
+
+    def __contains__(self, digest):
+        bits = self.bits
+        return all(bits[position >> 3] & (1 << (position & 7)) for position in self._positions(digest))
+
+
+class CompactURLSet:
+    """Drop-in for the scraper's seen-URL set: Bloom filter in memory, exact digests on disk.
+
+    Digests of new URLs are buffered and written in sorted batches. Without
+    a path they go to a private temporary SQLite database that disappears
+    when the set is closed. With a path they are kept, along with the
+    filter, and URLs claimed by earlier runs stay claimed for ttl seconds.
+    """
+    def __init__(self, capacity=1000000, error_rate=0.001, path=None, ttl=6 * 3600):
+        self.path = path
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.pending = set()  # Digests not written yet
+        self.forgotten = set()  # Digests to drop from the store at the next flush
+        self.filter_saved = False  # The bloom table matches the stored digests
+        self.filter_hits = 0  # Filter said "seen", so the exact store was asked
+        self.false_positives = 0  # ... and the URL turned out to be new
+        self.conn = sqlite3.connect(path or '', check_same_thread=False)
+        with self.lock:
+            self.conn.execute('PRAGMA cache_size=-2048')  # 2 MB page cache, the rest stays on disk
+            if path:
+                self.conn.execute('PRAGMA journal_mode=WAL')
+                self.conn.execute('PRAGMA synchronous=NORMAL')
+            self.conn.execute(
+                'CREATE TABLE IF NOT EXISTS seen (digest BLOB PRIMARY KEY, claimed_at REAL NOT NULL) WITHOUT ROWID'
+            )
+            columns = [row[1] for row in self.conn.execute('PRAGMA table_info(seen)')]
+            if 'claimed_at' not in columns:
+                # Sets kept before claims expired: their claims are dropped below
+                self.conn.execute('ALTER TABLE seen ADD COLUMN claimed_at REAL NOT NULL DEFAULT 0')
+            self.conn.execute(
+                'CREATE TABLE IF NOT EXISTS bloom ('
+                'id INTEGER PRIMARY KEY CHECK (id = 0), capacity INTEGER NOT NULL, '
+                'error_rate REAL NOT NULL, bits BLOB NOT NULL)'
+            )
+            # Claims older than the ttl expire; their bits would only add false positives
+            if self.conn.execute('DELETE FROM seen WHERE claimed_at < ?', (time.time() - ttl,)).rowcount:
+                self.conn.execute('DELETE FROM bloom')
+            self.conn.commit()
+            self.count = self.conn.execute('SELECT COUNT(*) FROM seen').fetchone()[0]
+            self.filter = self._load_filter(capacity, error_rate)
+
+    def _load_filter(self, capacity, error_rate):
+        """Reuse the saved filter if it is big enough, else rebuild one from the digests"""
+        row = self.conn.execute('SELECT capacity, error_rate, bits FROM bloom').fetchone()
+        if row is not None and row[0] >= max(capacity, self.count) and row[1] == error_rate:
+            self.filter_saved = True
+            return BloomFilter(row[0], row[1], row[2])
+        # Leave room for this run's candidates on top of the stored ones
+        bloom = BloomFilter(max(capacity, 2 * self.count), error_rate)
+        for (digest,) in self.conn.execute('SELECT digest FROM seen'):
+            bloom.add(digest)
+        return bloom
+
+    def add_new(self, url):
+        """Add url; True if it was not in the set yet"""
+        digest = url_digest(url)
+        with self.lock:
+            if not self.filter.add(digest):
+                # Seen before, or a false positive: the exact store decides
+                self.filter_hits += 1
+                if self._stored(digest):
+                    return False
+                self.false_positives += 1
+            self.pending.add(digest)
+            self.count += 1
+            if len(self.pending) >= 1000:
+                self._write()
+            return True
+
+    def add(self, url):
+        self.add_new(url)
+
+    def forget_later(self, url):
+        """Keep url claimed until the next flush, then drop it from the store"""
+        with self.lock:
+            self.forgotten.add(url_digest(url))
+
+    def discard(self, url):
+        """Forget url (its filter bits stay set; the exact store has the last word)"""
+        digest = url_digest(url)
+        with self.lock:
+            if digest in self.pending:
+                self.pending.discard(digest)
+                self.count -= 1
+                return
+            self._invalidate_saved_filter()
+            if self.conn.execute('DELETE FROM seen WHERE digest = ?', (digest,)).rowcount:
+                self.count -= 1
+            self.conn.commit()
+
+    def __contains__(self, url):
+        digest = url_digest(url)
+        with self.lock:
+            return digest in self.filter and self._stored(digest)
+
+    def __len__(self):
+        return self.count
+
+    def _stored(self, digest):
+        return digest in self.pending or self.conn.execute(
+            'SELECT 1 FROM seen WHERE digest = ?', (digest,)).fetchone() is not None
+
+    def _invalidate_saved_filter(self):
+        # Once the digests change, a saved filter may lack bits for them
+        if self.filter_saved:
+            self.conn.execute('DELETE FROM bloom')
+            self.filter_saved = False
+
+    def _write(self):
+        if not self.pending:
+            return
+        self._invalidate_saved_filter()
+        claimed_at = time.time()
+        self.conn.executemany(
+            'INSERT OR REPLACE INTO seen (digest, claimed_at) VALUES (?, ?)',
+            [(digest, claimed_at) for digest in sorted(self.pending)]
+        )
+        self.conn.commit()
+        self.pending.clear()
+
+    def _drop_forgotten(self):
+        if not self.forgotten:
+            return
+        # Their filter bits stay set, which only costs a disk lookup
+        self.count -= self.conn.executemany(
+            'DELETE FROM seen WHERE digest = ?', [(digest,) for digest in sorted(self.forgotten)]
+        ).rowcount
+        self.conn.commit()
+        self.forgotten.clear()
+
+    def flush(self):
+        """Write the buffered digests, drop the forgotten ones and, for a kept set, save the filter"""
+        with self.lock:
+            try:
+                self._write()
+                self._drop_forgotten()
+                if self.path and not self.filter_saved:
+                    self.conn.execute(
+                        'INSERT OR REPLACE INTO bloom (id, capacity, error_rate, bits) VALUES (0, ?, ?, ?)',
+                        (self.filter.capacity, self.filter.error_rate, bytes(self.filter.bits))
+                    )
+                    self.conn.commit()
+                    self.filter_saved = True
+            except sqlite3.Error:
+                pass  # Without a saved filter it is rebuilt from the digests next time
+
+    def close(self):
+        self.flush()
+        with self.lock:
+            self.conn.close()
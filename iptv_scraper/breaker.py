@@ -0,0 +1,63 @@
+"""
+Per-domain circuit breaker for link testing.
+
+A host that keeps timing out or refusing connections usually hosts hundreds
+of the candidate links (IPTV panels), and each of them would cost a full
+timeout. After ``threshold`` consecutive connection failures the breaker
+opens and links on that host are skipped; after ``cooldown`` seconds one
+probe is let through (half-open) and its outcome closes or re-opens it.
+"""
+
+import threading
+import time
+
+
+# Probe failure reasons that say the host itself is unreachable
+HOST_FAILURES = ('timeout', 'connection-error')
+
+
+class CircuitBreaker:
+    """Track consecutive connection failures per domain and skip dead hosts"""
+    def __init__(self, threshold=5, cooldown=60):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.lock = threading.Lock()
+        self.failures = {}  # domain -> consecutive host failures
+        self.opened_at = {}  # domain -> time the breaker opened
+        self.trial = set()  # domains with a half-open probe in flight
+        self.skipped = {}  # domain -> links skipped while open
+
+    def allow(self, domain):
+        """True when a link on this domain may be probed"""
+        if not self.threshold:
+            return True
+        with self.lock:
+            opened_at = self.opened_at.get(domain)
+            if opened_at is None:
+                return True
+            if domain not in self.trial and time.time() - opened_at >= self.cooldown:
+                self.trial.add(domain)  # Half-open: let one probe through
+                return True
+            self.skipped[domain] = self.skipped.get(domain, 0) + 1
+            return False
+
+    def record(self, domain, reason):
+        """Feed the outcome of a probe (its failure reason, or 'ok')"""
+        if not self.threshold:
+            return
+        with self.lock:
+            self.trial.discard(domain)
+            if reason in HOST_FAILURES:
+                failures = self.failures.get(domain, 0) + 1
+                self.failures[domain] = failures
+                if failures >= self.threshold:
+                    self.opened_at[domain] = time.time()
+            else:
+                # The host answered, whatever it answered
+                self.failures.pop(domain, None)
+                self.opened_at.pop(domain, None)
+
+    def skip_counts(self):
+        """Get (domain, skipped links) pairs, most skipped first"""
+        with self.lock:
+            return sorted(self.skipped.items(), key=lambda item: item[1], reverse=True)
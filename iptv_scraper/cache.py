@@ -0,0 +1,359 @@
+"""
+On-disk caches shared between scraper runs.
+
+Everything lives under a single cache directory (``$XDG_CACHE_HOME/iptv-scraper``
+or ``~/.cache/iptv-scraper`` by default).
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from urllib.parse import urlsplit, urlunsplit
+
+from iptv_scraper.validate import LEVELS
+
+
+def default_cache_dir():
+    """Get the directory used for all persistent scraper caches"""
+    base = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(base, 'iptv-scraper')
+
+
+def load_domain_stats(cache_dir=None):
+    """Load the per-domain success counts saved by previous runs"""
+    path = os.path.join(cache_dir or default_cache_dir(), 'domain_stats.json')
+    try:
+        with open(path, 'r', encoding='utf-8') as fh:
+            return json.load(fh)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_domain_stats(domain_stats, cache_dir=None):
+    """Save per-domain success counts, halving old ones so recent runs weigh more"""
+    cache_dir = cache_dir or default_cache_dir()
+    stats = {}
+    for domain, counts in list(domain_stats.items()):
+        success, total = counts['success'], counts['total']
+        while total > 200:
+            success, total = success // 2, total // 2
+        stats[domain] = {'success': success, 'total': total}
+
+    path = os.path.join(cache_dir, 'domain_stats.json')
+    fd, tmp_path = tempfile.mkstemp(dir=cache_dir, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as fh:
+            json.dump(stats, fh)
+        os.replace(tmp_path, path)
+    except OSError:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+class CachedSource:
+    """A source playlist body stored on disk"""
+    def __init__(self, url, path, status, meta):
+        self.url = url
+        self.path = path
+        self.status = status  # 'fresh', 'not-modified', 'downloaded' or 'stale'
+        self.meta = meta
+
+    @property
+    def changed(self):
+        """True when the body differs from what was cached before this fetch"""
+        return self.status == 'downloaded'
+
+    def chunks(self, size=1 << 20):
+        """Iterate over the cached body in large text chunks"""
+        with open(self.path, 'r', encoding='utf-8', errors='replace') as fh:
+            while True:
+                chunk = fh.read(size)
+                if not chunk:
+                    break
+                yield chunk
+
+
+class SourceCache:
+    """Conditional-GET cache for M3U source playlists.
+
+    Each body is stored next to a small JSON file holding its ETag and
+    Last-Modified validators. They are sent back as If-None-Match and
+    If-Modified-Since, so an unchanged playlist costs a 304 instead of a full
+    download. Entries validated less than ``max_age`` seconds ago are served
+    without touching the network at all.
+    """
+    def __init__(self, cache_dir=None, max_age=0):
+        self.cache_dir = os.path.join(cache_dir or default_cache_dir(), 'sources')
+        self.max_age = max_age
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def _paths(self, url):
+        key = hashlib.sha1(url.encode('utf-8')).hexdigest()
+        base = os.path.join(self.cache_dir, key)
+        return base + '.m3u', base + '.json'
+
+    def _load_meta(self, url):
+        body_path, meta_path = self._paths(url)
+        if not os.path.exists(body_path):
+            return None
+        try:
+            with open(meta_path, 'r', encoding='utf-8') as fh:
+                return json.load(fh)
+        except (OSError, ValueError):
+            return None
+
+    def _save_meta(self, url, meta):
+        _, meta_path = self._paths(url)
+        self._atomic_write(meta_path, json.dumps(meta).encode('utf-8'))
+
+    def _atomic_write(self, path, data):
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as fh:
+                fh.write(data)
+            os.replace(tmp_path, path)
+        except OSError:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def fetch(self, session, url, timeout=15, cancel=None, hooks=None):
+        """Get a source playlist, revalidating the cached copy when there is one.
+
+        Returns a CachedSource, or None when the source is unavailable and
+        nothing is cached for it. A download is abandoned (and None
+        returned) as soon as the optional cancel() callable returns True;
+        hooks are passed on to the request.
+        """
+        body_path, _ = self._paths(url)
+        meta = self._load_meta(url)
+        now = time.time()
+
+        if meta and self.max_age and now - meta.get('checked_at', 0) < self.max_age:
+            return CachedSource(url, body_path, 'fresh', meta)
+
+        headers = {}
+        if meta:
+            if meta.get('etag'):
+                headers['If-None-Match'] = meta['etag']
+            if meta.get('last_modified'):
+                headers['If-Modified-Since'] = meta['last_modified']
+
+        try:
+            response = session.get(url, timeout=timeout, headers=headers, stream=True, hooks=hooks)
+        except Exception:
+            # Network trouble: an old copy beats no copy
+            return CachedSource(url, body_path, 'stale', meta) if meta else None
+
+        try:
+            if response.status_code == 304 and meta:
+                meta['checked_at'] = now
+                self._save_meta(url, meta)
+                return CachedSource(url, body_path, 'not-modified', meta)
+
+            if response.status_code != 200:
+                return None
+
+            # Stream the body to disk so large playlists never sit in memory
+            fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix='.tmp')
+            cancelled = False
+            try:
+                with os.fdopen(fd, 'wb') as fh:
+                    for chunk in response.iter_content(65536):
+                        if cancel is not None and cancel():
+                            cancelled = True
+                            break
+                        fh.write(chunk)
+                if cancelled:
+                    os.remove(tmp_path)
+                    return None
+                os.replace(tmp_path, body_path)
+            except Exception:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                return CachedSource(url, body_path, 'stale', meta) if meta else None
+        finally:
+            response.close()
+
+        meta = {
+            'url': url,
+            'etag': response.headers.get('ETag'),
+            'last_modified': response.headers.get('Last-Modified'),
+            'checked_at': now,
+            'downloaded_at': now,
+        }
+        self._save_meta(url, meta)
+        return CachedSource(url, body_path, 'downloaded', meta)
+
+
+class RepoPlaylistCache:
+    """Playlist files found in GitHub repositories, kept between runs.
+
+    Entries are keyed by repository and remember the ``pushed_at`` timestamp
+    and default branch commit they were listed at. While either still
+    matches, the repository's file tree does not have to be fetched again.
+    """
+    def __init__(self, cache_dir=None):
+        self.path = os.path.join(cache_dir or default_cache_dir(), 'github_repos.json')
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self.lock = threading.Lock()
+        try:
+            with open(self.path, 'r', encoding='utf-8') as fh:
+                self.repos = json.load(fh)
+        except (OSError, ValueError):
+            self.repos = {}
+
+    def lookup(self, repo, pushed_at=None, sha=None):
+        """Get the cached playlist URLs if the repo is unchanged, else None"""
+        with self.lock:
+            entry = self.repos.get(repo)
+        if not entry:
+            return None
+        if pushed_at and entry.get('pushed_at') == pushed_at:
+            return entry['playlists']
+        if sha and entry.get('sha') == sha:
+            return entry['playlists']
+        return None
+
+    def store(self, repo, pushed_at, sha, playlists):
+        with self.lock:
+            self.repos[repo] = {
+                'pushed_at': pushed_at,
+                'sha': sha,
+                'playlists': playlists,
+            }
+
+    def save(self):
+        """Write the cache to disk"""
+        with self.lock:
+            data = json.dumps(self.repos).encode('utf-8')
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(self.path), suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as fh:
+                fh.write(data)
+            os.replace(tmp_path, self.path)
+        except OSError:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+
+def normalize_url(url):
+    """Canonical form of a stream URL used as a result cache key"""
+    try:
+        parts = urlsplit(url.strip())
+        host = (parts.hostname or '').lower()
+        port = parts.port
+    except ValueError:
+        return url.strip()
+    scheme = parts.scheme.lower()
+    if port and (scheme, port) not in (('http', 80), ('https', 443)):
+        host = f'{host}:{port}'
+    if parts.username or parts.password:
+        host = f'{parts.username or ""}:{parts.password or ""}@{host}'
+    return urlunsplit((scheme, host, parts.path or '/', parts.query, ''))
+
+
+class ResultCache:
+    """Outcome of every link test, kept between runs in SQLite.
+
+    Results stay valid for ``ok_ttl`` seconds when the link worked and
+    ``failed_ttl`` seconds when it did not, so repeat searches only probe
+    links whose state is unknown. Each result carries the validation level
+    it was tested at: a success also holds for lower levels and a failure
+    for higher ones, but not the other way round. A success also keeps the
+    probe's details (renditions and stream metrics), so a link reused from
+    the cache can still be ranked. Writes are batched.
+    """
+    def __init__(self, path=None, ok_ttl=1800, failed_ttl=6 * 3600):
+        if path is None:
+            path = os.path.join(default_cache_dir(), 'results.sqlite3')
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.path = path
+        self.ok_ttl = ok_ttl
+        self.failed_ttl = failed_ttl
+        self.lock = threading.Lock()
+        self.pending = []
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        with self.lock:
+            self.conn.execute('PRAGMA journal_mode=WAL')
+            self.conn.execute('PRAGMA synchronous=NORMAL')
+            self.conn.execute(
+                'CREATE TABLE IF NOT EXISTS results ('
+                'url TEXT PRIMARY KEY, ok INTEGER NOT NULL, reason TEXT, '
+                'latency REAL, checked_at REAL NOT NULL, level TEXT, details TEXT)'
+            )
+            columns = [row[1] for row in self.conn.execute('PRAGMA table_info(results)')]
+            if 'level' not in columns:
+                # Older caches: their results have no level and are never reused
+                self.conn.execute('ALTER TABLE results ADD COLUMN level TEXT')
+            if 'details' not in columns:
+                self.conn.execute('ALTER TABLE results ADD COLUMN details TEXT')
+
+    def lookup(self, url):
+        """Get the stored (ok, reason, latency, checked_at, level, details) for a URL, or None"""
+        with self.lock:
+            return self.conn.execute(
+                'SELECT ok, reason, latency, checked_at, level, details FROM results WHERE url = ?',
+                (normalize_url(url),)
+            ).fetchone()
+
+    def get(self, url, level='standard', details=None):
+        """Get the cached verdict for a URL at a validation level while it is within its TTL, else None.
+
+        For a reused success, the stored probe details are copied into the
+        details dict, if given.
+        """
+        row = self.lookup(url)
+        if row is None:
+            return None
+        ok, _, _, checked_at, tested_level, stored_details = row
+        if tested_level not in LEVELS:
+            return None
+        if ok and LEVELS.index(tested_level) < LEVELS.index(level):
+            return None  # Passed fewer checks than this level asks for
+        if not ok and LEVELS.index(tested_level) > LEVELS.index(level):
+            return None  # May have failed a check this level does not make
+        ttl = self.ok_ttl if ok else self.failed_ttl
+        if time.time() - checked_at >= ttl:
+            return None
+        if ok and details is not None and stored_details:
+            try:
+                details.update(json.loads(stored_details))
+            except ValueError:
+                pass  # Unreadable details only cost the link its rank
+        return bool(ok)
+
+    def record(self, url, ok, reason=None, latency=None, level='standard', details=None):
+        stored_details = json.dumps(details) if ok and details else None
+        with self.lock:
+            self.pending.append((normalize_url(url), int(bool(ok)), reason, latency, time.time(), level, stored_details))
+            if len(self.pending) >= 200:
+                self._flush()
+
+    def _flush(self):
+        if not self.pending:
+            return
+        try:
+            with self.conn:
+                self.conn.executemany(
+                    'INSERT OR REPLACE INTO results (url, ok, reason, latency, checked_at, level, details) '
+                    'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                    self.pending
+                )
+        except sqlite3.Error:
+            pass  # Losing a batch of results only costs re-testing them
+        self.pending = []
+
+    def flush(self):
+        """Write batched results to disk"""
+        with self.lock:
+            self._flush()
+
+    def close(self):
+        with self.lock:
+            self._flush()
+            self.conn.close()
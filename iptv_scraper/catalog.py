@@ -0,0 +1,318 @@
+"""
+Persistent channel catalog with an inverted token index.
+
+Every entry parsed from a source playlist is stored with its EXTINF metadata,
+and the words of its title and attributes are indexed, so an offline search
+(``--search-catalog``) is an index lookup instead of a download and scan of
+every playlist. Search terms match anywhere in a title or URL, not just at
+word starts, so a term's words are looked up in the vocabulary of indexed
+words by substring first; URLs are not tokenized (their tokens are mostly
+unique hashes and ids) but searched with instr() inside SQLite. Sources are
+re-indexed only when the source cache reports that their body changed.
+"""
+
+import json
+import os
+import re
+import sqlite3
+import threading
+
+from iptv_scraper.cache import default_cache_dir
+from iptv_scraper.m3u import M3UEntry
+
+
+_TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sources (
+    url TEXT PRIMARY KEY,
+    version TEXT NOT NULL,
+    entries INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS entries (
+    id INTEGER PRIMARY KEY,
+    source TEXT NOT NULL,
+    title TEXT NOT NULL,
+    url TEXT NOT NULL,
+    attributes TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS entries_source ON entries (source);
+CREATE TABLE IF NOT EXISTS tokens (
+    token TEXT NOT NULL,
+    entry_id INTEGER NOT NULL,
+    PRIMARY KEY (token, entry_id)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS words (
+    word TEXT PRIMARY KEY
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS staged_entries (
+    id INTEGER PRIMARY KEY,
+    source TEXT NOT NULL,
+    title TEXT NOT NULL,
+    url TEXT NOT NULL,
+    attributes TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS staged_entries_source ON staged_entries (source);
+"""
+
+# Entries written to the staging tables per transaction while indexing
+STAGE_BATCH = 1000
+
+# Bumped when what is indexed changes; older catalogs are emptied and rebuilt
+SCHEMA_VERSION = 2
+
+
+def tokenize(text):
+    """Split text into the lowercase word tokens used by the index"""
+    return _TOKEN_RE.findall(text.lower())
+
+
+def entry_tokens(title, attributes):
+    """Tokens indexed for an entry: its title and attribute words, not URLs"""
+    tokens = set(tokenize(title))
+    for value in attributes.values():
+        if '://' not in value:  # tvg-logo and the like
+            tokens.update(tokenize(value))
+    return tokens
+
+
+class ChannelCatalog:
+    """SQLite-backed catalog of every entry seen in the source playlists"""
+    def __init__(self, path=None):
+        if path is None:
+            path = os.path.join(default_cache_dir(), 'catalog.sqlite3')
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.path = path
+        self.lock = threading.Lock()
+        self.vocabulary_matches = {}  # term word -> indexed words containing it
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        with self.lock:
+            self.conn.execute('PRAGMA journal_mode=WAL')
+            self.conn.execute('PRAGMA synchronous=NORMAL')
+            self.conn.executescript(_SCHEMA)
+            if self.conn.execute('PRAGMA user_version').fetchone()[0] < SCHEMA_VERSION:
+                # Catalogs that indexed URL tokens: their sources are re-indexed as they are fetched
+                with self.conn:
+                    self.conn.execute('DROP TABLE IF EXISTS staged_tokens')
+                    for table in ('staged_entries', 'tokens', 'words', 'entries', 'sources'):
+                        self.conn.execute(f'DELETE FROM {table}')
+                self.conn.execute(f'PRAGMA user_version = {SCHEMA_VERSION}')
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+    def is_current(self, source_url, version):
+        """True when the source is indexed at this version"""
+        with self.lock:
+            row = self.conn.execute(
+                'SELECT version FROM sources WHERE url = ?', (source_url,)
+            ).fetchone()
+        return row is not None and row[0] == version
+
+    def index_source(self, source_url, version, entries):
+        """Pass entries through while indexing them.
+
+        Entries are written in batches to staging tables as they go by, and
+        the index for the source is replaced by the staged one only once
+        every entry has been consumed, so a collection that stops early
+        leaves the previous index (and its version) untouched.
+        """
+        with self.lock, self.conn:
+            self._drop_staged(source_url)
+        count = 0
+        batch = []
+        complete = False
+        try:
+            for entry in entries:
+                batch.append(entry)
+                yield entry
+                if len(batch) >= STAGE_BATCH:
+                    self._stage(source_url, batch)
+                    count += len(batch)
+                    batch = []
+            self._stage(source_url, batch)
+            count += len(batch)
+            complete = True
+        finally:
+            with self.lock, self.conn:
+                if complete:
+                    self._publish_staged(source_url, version, count)
+                self._drop_staged(source_url)
+
+    def _stage(self, source_url, entries):
+        with self.lock, self.conn:
+            # Ids are handed out here since the lock keeps other sources from staging meanwhile
+            first = self.conn.execute('SELECT COALESCE(MAX(id), 0) + 1 FROM staged_entries').fetchone()[0]
+            self.conn.executemany(
+                'INSERT INTO staged_entries (id, source, title, url, attributes) VALUES (?, ?, ?, ?, ?)',
+                [(first + i, source_url, entry.title, entry.url, json.dumps(entry.attributes))
+                 for i, entry in enumerate(entries)]
+            )
+
+    def _publish_staged(self, source_url, version, count):
+        """Replace the source's index with its staged entries, keeping their order"""
+        self._drop_source(source_url)
+        first = self.conn.execute(
+            'SELECT MIN(id) FROM staged_entries WHERE source = ?', (source_url,)
+        ).fetchone()[0]
+        if first is not None:
+            # Staged ids map onto fresh entry ids past the current ones
+            offset = self.conn.execute('SELECT COALESCE(MAX(id), 0) FROM entries').fetchone()[0] + 1 - first
+            self.conn.execute(
+                'INSERT INTO entries (id, source, title, url, attributes) '
+                'SELECT id + ?, source, title, url, attributes FROM staged_entries WHERE source = ?',
+                (offset, source_url)
+            )
+            # Tokens are written once, here, in index order a batch at a time
+            staged = self.conn.execute(
+                'SELECT id + ?, title, attributes FROM staged_entries WHERE source = ? ORDER BY id',
+                (offset, source_url)
+            )
+            while True:
+                rows = staged.fetchmany(STAGE_BATCH)
+                if not rows:
+                    break
+                token_rows = sorted(
+                    (token, entry_id)
+                    for entry_id, title, attributes in rows
+                    for token in entry_tokens(title, json.loads(attributes))
+                )
+                self.conn.executemany('INSERT INTO tokens (token, entry_id) VALUES (?, ?)', token_rows)
+                self.conn.executemany(
+                    'INSERT OR IGNORE INTO words (word) VALUES (?)',
+                    ((token,) for token in sorted({token for token, _ in token_rows}))
+                )
+            self.vocabulary_matches.clear()
+        self.conn.execute(
+            'INSERT OR REPLACE INTO sources (url, version, entries) VALUES (?, ?, ?)',
+            (source_url, version, count)
+        )
+
+    def _drop_staged(self, source_url):
+        self.conn.execute('DELETE FROM staged_entries WHERE source = ?', (source_url,))
+
+    def _drop_source(self, source_url):
+        first, last = self.conn.execute(
+            'SELECT MIN(id), MAX(id) FROM entries WHERE source = ?', (source_url,)
+        ).fetchone()
+        if first is not None:
+            # Its id range holds only its entries (see _candidate_ids), so
+            # one probe per word finds its tokens without scanning the table
+            self.conn.execute(
+                'DELETE FROM tokens WHERE token IN (SELECT word FROM words) AND entry_id BETWEEN ? AND ?',
+                (first, last)
+            )
+        self.conn.execute('DELETE FROM entries WHERE source = ?', (source_url,))
+        self.conn.execute('DELETE FROM sources WHERE url = ?', (source_url,))
+        # Words no other source uses any more
+        if self.conn.execute(
+            'DELETE FROM words WHERE NOT EXISTS (SELECT 1 FROM tokens WHERE token = words.word)'
+        ).rowcount:
+            self.vocabulary_matches.clear()
+
+    def _words_containing(self, word):
+        """Indexed words containing word, looked up once until the vocabulary changes"""
+        words = self.vocabulary_matches.get(word)
+        if words is None:
+            words = [row[0] for row in self.conn.execute(
+                'SELECT word FROM words WHERE instr(word, ?) > 0', (word,)
+            )]
+            self.vocabulary_matches[word] = words
+        return words
+
+    def _title_ids(self, term, first, last):
+        """Entry ids in [first, last] having, for every word of the term, a token containing it.
+
+        A title containing the term contains each of its words inside one of
+        its tokens, so this never misses a title match; the matcher weeds
+        out the extra candidates.
+        """
+        ids = None
+        for word in tokenize(term):
+            words = self._words_containing(word)
+            word_ids = set()
+            for start in range(0, len(words), 500):
+                batch = words[start:start + 500]
+                word_ids.update(row[0] for row in self.conn.execute(
+                    'SELECT entry_id FROM tokens WHERE token IN (%s) AND entry_id BETWEEN ? AND ?'
+                    % ','.join('?' * len(batch)),
+                    batch + [first, last]
+                ))
+            ids = word_ids if ids is None else ids & word_ids
+            if not ids:
+                break
+        return ids or set()
+
+    def _candidate_ids(self, terms, source_url):
+        """Ids of the entries whose title may match, or whose URL contains, one of terms"""
+        if source_url is None:
+            first, last = self.conn.execute('SELECT MIN(id), MAX(id) FROM entries').fetchone()
+        else:
+            # A source's entries are published past every existing id, so
+            # its id range holds no other source's entries
+            first, last = self.conn.execute(
+                'SELECT MIN(id), MAX(id) FROM entries WHERE source = ?', (source_url,)
+            ).fetchone()
+        if first is None:
+            return set()
+
+        ids = set()
+        for term in terms:
+            ids.update(self._title_ids(term, first, last))
+        # LIMIT -1 keeps SQLite from flattening the subquery and lowering each URL once per term
+        ids.update(row[0] for row in self.conn.execute(
+            'SELECT id FROM (SELECT id, lower(url) AS url FROM entries WHERE id BETWEEN ? AND ? LIMIT -1) '
+            'WHERE ' + ' OR '.join(['instr(url, ?) > 0'] * len(terms)),
+            [first, last] + terms
+        ))
+        return ids
+
+    def search(self, matcher=None, source_url=None):
+        """Yield the catalog entries matched by a TermMatcher (None matches all).
+
+        Candidates come from the token index and a scan of the URLs (see
+        _candidate_ids) and are then checked with the matcher itself, so results agree with a plain scan
+        of the playlists. A term without any word characters cannot be
+        looked up and makes the search scan the entries instead.
+        """
+        # Terms the matcher dropped as redundant are covered by a shorter
+        # term: whatever contains "sky sports" contains "sports"
+        terms = [] if matcher is None or matcher.match_all else matcher.terms
+        indexed = all(tokenize(term) for term in terms)
+
+        with self.lock:
+            if not terms or not indexed:
+                if source_url is None:
+                    rows = self.conn.execute(
+                        'SELECT title, url, attributes FROM entries ORDER BY id'
+                    )
+                else:
+                    rows = self.conn.execute(
+                        'SELECT title, url, attributes FROM entries WHERE source = ? ORDER BY id',
+                        (source_url,)
+                    )
+                rows = rows.fetchall()
+            else:
+                rows = []
+                ordered_ids = sorted(self._candidate_ids(terms, source_url))
+                for start in range(0, len(ordered_ids), 500):
+                    batch = ordered_ids[start:start + 500]
+                    rows.extend(self.conn.execute(
+                        'SELECT title, url, attributes FROM entries WHERE id IN (%s) ORDER BY id'
+                        % ','.join('?' * len(batch)),
+                        batch
+                    ).fetchall())
+
+        for title, url, attributes in rows:
+            if terms and not matcher.matches(title + ' ' + url):
+                continue
+            yield M3UEntry(title, url, json.loads(attributes))
+
+    def stats(self):
+        """Get (source count, entry count) for the catalog"""
+        with self.lock:
+            sources, entries = self.conn.execute(
+                'SELECT COUNT(*), COALESCE(SUM(entries), 0) FROM sources'
+            ).fetchone()
+        return sources, entries
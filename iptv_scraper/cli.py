@@ -1,21 +1,45 @@
 import requests
-from bs4 import BeautifulSoup
 from art import text2art
 from colorama import init
 from termcolor import colored
+import contextlib
 import datetime
 import os
 import argparse
 import re
-from urllib.parse import urljoin
+from urllib.parse import quote, urljoin, urlparse
 import subprocess
 import sys
 import threading
 import time
 import itertools
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 import json
+import queue
 import signal
+import socket
+import sqlite3
+
+from iptv_scraper.aio import AsyncLinkTester, aiohttp
+from iptv_scraper.bloom import CompactURLSet
+from iptv_scraper.breaker import CircuitBreaker
+from iptv_scraper.cache import RepoPlaylistCache, ResultCache, SourceCache, load_domain_stats, save_domain_stats
+from iptv_scraper.catalog import ChannelCatalog
+from iptv_scraper.extract import HTMLPage, find_stream_urls
+from iptv_scraper.jsonstream import iter_json_array
+from iptv_scraper.m3u import iter_entry_blocks, parse_m3u, parse_m3u_blocks
+from iptv_scraper.playlistcache import PlaylistCache
+from iptv_scraper.ranking import rank_links
+from iptv_scraper.ratelimit import HostLimiter
+from iptv_scraper.scheduler import LinkScheduler, LinkScorer, screened
+from iptv_scraper.search import TermMatcher, expand_search_terms
+from iptv_scraper.sharded import ShardedCounter, ShardedSet
+from iptv_scraper import resolver, validate
+from iptv_scraper.validate import STREAM_HEADERS
+
+
+# Upper bound on playlists taken from a single discovered GitHub repository
+GITHUB_MAX_PLAYLISTS_PER_REPO = 50
 
 
 class Spinner:
@@ -50,19 +74,55 @@ class Spinner:
 
 
 class IPTVScraper:
-    def __init__(self):
+    def __init__(self, source_workers=16, source_host_limit=8, link_workers=25,
+                 use_cache=True, cache_max_age=0, engine='thread', async_concurrency=500,
+                 ok_ttl=1800, failed_ttl=6 * 3600, breaker_threshold=5, breaker_cooldown=60,
+                 host_limit=8, host_rate=10, dns_cache=True, validation='standard', two_pass=False,
+                 compact_dedup=False, dedup_error_rate=0.001, dedup_file=None, rank=False, top_per_channel=0):
         self.scraped_links = []
-        self.checked_urls = set()  # Avoid testing same URL twice
-        self.total_tested = 0
+        self.checked_urls = ShardedSet()  # Avoid testing same URL twice (claimed atomically)
+        self.tested = ShardedCounter()  # Probes completed, read as total_tested
         self.total_working = 0
+        self.cached_results = {True: 0, False: 0}  # Verdicts reused from the result cache
+        self.dns_skipped = set()  # Links dropped because their host name does not exist
         self.lock = threading.Lock()  # Thread-safe counter
         self.shutdown_flag = threading.Event()  # Flag to signal shutdown
-        
-        # Connection pooling for faster requests
+        self.stop_event = threading.Event()  # Link target reached: wind down downloads and probes
+        self.open_responses = {}  # response -> deadline (or None) while it is being read
+        self.watchdog = None
+        
+        # Phase 2 link testing: 'thread' runs link_workers threads, 'async'
+        # runs up to async_concurrency probes on one event loop; either way
+        # at most host_limit probes per host, started at host_rate per second
+        self.link_workers = max(1, link_workers)
+        self.engine = engine
+        self.async_concurrency = max(1, async_concurrency)
+        self.host_limit = max(0, host_limit)
+        self.host_rate = max(0, host_rate)
+        
+        # How thoroughly links are checked (validate.LEVELS); with two_pass
+        # every candidate gets a quick probe first and only the survivors
+        # are checked at that level
+        self.validation = validation
+        self.two_pass = two_pass and validation != 'quick'
+        
+        # Saved playlist ordered by measured startup time, optionally only the
+        # fastest mirrors of each channel; probes then also measure throughput
+        self.top_per_channel = top_per_channel
+        self.rank = rank or top_per_channel > 0
+        
+        # Phase 1 source collection limits
+        self.source_workers = max(1, source_workers)
+        self.source_host_limit = max(1, source_host_limit)
+        self.source_host_slots = {}  # host -> BoundedSemaphore
+        
+        # Connection pooling for faster requests: a pool for every host the
+        # workers may be talking to at once, each deep enough for the
+        # per-host limits (a probe holds its playlist while fetching a segment)
         self.session = requests.Session()
         adapter = requests.adapters.HTTPAdapter(
-            pool_connections=50,
-            pool_maxsize=50,
+            pool_connections=max(50, self.link_workers + self.source_workers),
+            pool_maxsize=max(2 * self.host_limit or self.link_workers, self.source_host_limit),
             max_retries=1,
             pool_block=False
         )
@@ -72,8 +132,52 @@ class IPTVScraper:
         # Domain reputation cache (track success rates)
         self.domain_stats = {}  # domain -> {'success': 0, 'total': 0}
         
+        # Skips hosts that keep timing out or refusing connections
+        self.breaker = CircuitBreaker(threshold=breaker_threshold, cooldown=breaker_cooldown)
+        
+        # Shared DNS cache (process-wide) so each host name is resolved once
+        self.dns = resolver.install() if dns_cache else None
+        
+        # Nested playlists shared by concurrent probes, fetched once at a time
+        self.playlist_cache = PlaylistCache()
+        
+        # Conditional-GET cache for M3U sources and the channel catalog
+        # built from it (both None when disabled)
+        self.source_cache = None
+        self.catalog = None
+        self.repo_cache = None
+        self.result_cache = None
+        if use_cache:
+            try:
+                self.source_cache = SourceCache(max_age=cache_max_age)
+                self.catalog = ChannelCatalog()
+                self.repo_cache = RepoPlaylistCache()
+                self.result_cache = ResultCache(ok_ttl=ok_ttl, failed_ttl=failed_ttl)
+                self.domain_stats = load_domain_stats()
+            except (OSError, sqlite3.Error):
+                pass  # Read-only home directory, fall back to plain downloads
+        
+        # Compact dedup: seen URLs in a Bloom filter, with the exact check on disk
+        # (URLs that failed stay claimed for failed_ttl in a dedup_file)
+        self.compact_dedup = compact_dedup or dedup_file is not None
+        if self.compact_dedup:
+            try:
+                self.checked_urls = CompactURLSet(self._dedup_capacity(), dedup_error_rate, dedup_file, failed_ttl)
+            except (OSError, sqlite3.Error) as e:
+                print(colored(f"[!] Could not open dedup file {dedup_file}: {e}; URLs tested by earlier runs will be tested again", "red"))
+                self.checked_urls = CompactURLSet(self._dedup_capacity(), dedup_error_rate)
+        
         init()
     
+    def _dedup_capacity(self):
+        """Expected number of candidate URLs: every entry in the channel catalog, if there is one"""
+        if self.catalog is not None:
+            try:
+                return max(self.catalog.stats()[1], 100000)
+            except sqlite3.Error:
+                pass
+        return 1000000
+    
     def get_nsfw_sources(self):
         """Get NSFW/Adult specific sources"""
         return [
@@ -88,168 +192,10 @@ class IPTVScraper:
     
     def expand_search_terms(self, query):
         """Expand search query with related terms and synonyms"""
-        if not query:
-            return []
-        
-        query_lower = query.lower()
-        expanded_terms = [query_lower]
-        
-        # Sports-related synonyms
-        sports_synonyms = {
-            'football': ['soccer', 'futbol', 'foot', 'fifa', 'premier', 'league', 'calcio', 'fussball', 'bundesliga', 'laliga', 'serie a'],
-            'soccer': ['football', 'futbol', 'foot', 'fifa', 'premier', 'league', 'champions', 'uefa'],
-            'basketball': ['nba', 'basket', 'hoops', 'bball', 'euroleague'],
-            'nba': ['basketball', 'basket', 'hoops'],
-            'tennis': ['atp', 'wta', 'tennis channel', 'grand slam', 'wimbledon', 'us open'],
-            'boxing': ['fight', 'ufc', 'mma', 'combat', 'wrestling', 'wwe', 'aew', 'ppv'],
-            'fight': ['boxing', 'ufc', 'mma', 'combat', 'wrestling', 'bellator'],
-            'ufc': ['fight', 'mma', 'combat', 'boxing', 'bellator'],
-            'mma': ['ufc', 'fight', 'combat', 'boxing', 'bellator'],
-            'racing': ['formula', 'f1', 'nascar', 'motogp', 'motor', 'rally', 'indycar'],
-            'f1': ['formula', 'racing', 'motor', 'grand prix', 'formula 1', 'formula1'],
-            'cricket': ['ipl', 'bbl', 'cricket live', 'test cricket', 't20'],
-            'baseball': ['mlb', 'baseball live'],
-            'hockey': ['nhl', 'ice hockey'],
-            'golf': ['pga', 'masters', 'golf channel'],
-            'sport': ['sports', 'espn', 'fox sports', 'sky sports', 'bein', 'tsn', 'dazn', 'eurosport'],
-            'sports': ['sport', 'espn', 'fox sports', 'sky sports', 'bein', 'tsn', 'dazn', 'eurosport'],
-            'bein': ['bein sports', 'beinsports', 'bein sport', 'bien sports', 'bien', 'beIN', 'bein 1', 'bein 2', 'bein fr', 'bein ar', 'bein en'],
-            'beinsports': ['bein', 'bein sports', 'bein sport', 'bien sports'],
-            'espn': ['espn+', 'espn plus', 'espn deportes', 'espn2', 'espn news'],
-            'sky': ['sky sports', 'sky cinema', 'sky news', 'sky sport'],
-            'dazn': ['dazn1', 'dazn2', 'dazn sports', 'dazn live'],
-            'eurosport': ['euro sport', 'eurosport 1', 'eurosport 2'],
-            'premier': ['premier league', 'epl', 'premiership'],
-            'champions': ['champions league', 'ucl', 'uefa'],
-        }
-        
-        # News-related synonyms
-        news_synonyms = {
-            'news': ['noticias', 'nouvelles', 'nachrichten', 'breaking', 'live news', 'cnn', 'bbc'],
-            'cnn': ['news', 'cable news', 'breaking'],
-            'bbc': ['news', 'british', 'uk news'],
-            'aljazeera': ['al jazeera', 'jazeera', 'arabic news', 'qatar'],
-            'sky': ['sky news', 'news', 'uk'],
-        }
-        
-        # Entertainment synonyms
-        entertainment_synonyms = {
-            'movie': ['movies', 'cinema', 'film', 'peliculas', 'filme'],
-            'movies': ['movie', 'cinema', 'film', 'peliculas', 'filme'],
-            'series': ['tv shows', 'shows', 'drama', 'serie'],
-            'kids': ['children', 'cartoon', 'disney', 'nickelodeon', 'cartoon network'],
-            'cartoon': ['kids', 'animation', 'anime', 'disney'],
-            'music': ['mtv', 'vh1', 'music video', 'concert'],
-            'documentary': ['discovery', 'national geographic', 'history', 'natgeo', 'docs'],
-            'discovery': ['documentary', 'science', 'nature', 'animal planet'],
-        }
-        
-        # Regional/Language synonyms
-        regional_synonyms = {
-            'arabic': ['arab', 'عربي', 'mbc', 'osn', 'rotana', 'nile', 'saudi', 'dubai', 'aljazeera'],
-            'arab': ['arabic', 'mbc', 'osn', 'rotana', 'middle east'],
-            'tunisia': ['tunisie', 'tunisian', 'tunis', 'maghreb', 'north africa'],
-            'egypt': ['egyptian', 'cairo', 'nile', 'مصر'],
-            'morocco': ['maroc', 'moroccan', 'maghreb'],
-            'algeria': ['algerian', 'maghreb', 'dzair'],
-            'france': ['french', 'français', 'tf1', 'm6', 'canal'],
-            'uk': ['british', 'britain', 'bbc', 'itv'],
-            'usa': ['us', 'american', 'america', 'united states'],
-            'spain': ['spanish', 'español', 'espana'],
-        }
-        
-        # Brand/Network synonyms
-        network_synonyms = {
-            'bein': ['bein sports', 'beinsport', 'bein sport', 'bien'],
-            'espn': ['espn+', 'espn plus', 'espn deportes'],
-            'sky': ['sky sports', 'sky cinema', 'sky news'],
-            'fox': ['fox sports', 'fox news', 'fox channel'],
-            'mbc': ['mbc1', 'mbc2', 'mbc3', 'mbc drama', 'mbc action'],
-            'osn': ['osn sports', 'osn movies', 'orbit'],
-            'dazn': ['dazn1', 'dazn2', 'dazn sports'],
-        }
-        
-        # NSFW/Adult synonyms
-        nsfw_synonyms = {
-            'adult': ['xxx', '18+', 'nsfw', 'playboy', 'hustler', 'penthouse', 'venus', 'dorcel'],
-            'xxx': ['adult', '18+', 'nsfw', 'playboy', 'hustler'],
-            'nsfw': ['adult', 'xxx', '18+'],
-            '18+': ['adult', 'xxx', 'nsfw'],
-            'playboy': ['adult', 'xxx', 'hustler', 'penthouse'],
-            'venus': ['adult', 'xxx', 'dorcel'],
-        }
-        
-        # TV Channel synonyms
-        tv_channel_synonyms = {
-            'tv': ['television', 'channel', 'live tv', 'broadcast'],
-            'channel': ['tv', 'television', 'live', 'broadcast'],
-            'cnn': ['news', 'cable news network', 'cnn international'],
-            'hbo': ['premium', 'movies', 'series', 'hbo max'],
-            'showtime': ['premium', 'movies'],
-            'nbc': ['network', 'broadcast'],
-            'cbs': ['network', 'broadcast'],
-            'abc': ['network', 'broadcast'],
-            'fox': ['network', 'broadcast', 'fox news'],
-            'mtv': ['music', 'music television'],
-            'comedy': ['comedy central', 'standup'],
-            'hgtv': ['home', 'garden', 'diy'],
-            'food': ['food network', 'cooking'],
-            'tlc': ['learning', 'reality'],
-            'lifetime': ['movies', 'drama'],
-            'syfy': ['sci-fi', 'science fiction'],
-            'cartoon': ['cartoon network', 'cn', 'cartoons', 'toon', 'boomerang'],
-            'disney': ['disney channel', 'disney+', 'disney junior', 'disney xd'],
-            'nickelodeon': ['nick', 'nick jr', 'nicktoons'],
-            'discovery': ['discovery channel', 'discovery+', 'science', 'tlc'],
-            'natgeo': ['national geographic', 'nat geo', 'nat geo wild'],
-            'history': ['history channel', 'h2'],
-            'amc': ['amc network', 'walking dead'],
-            'fx': ['fxx', 'fxm'],
-            'tnt': ['tbs', 'tru tv'],
-            'usa': ['usa network'],
-            'bravo': ['bravo tv'],
-            'e!': ['e entertainment'],
-            'travel': ['travel channel'],
-            'animal': ['animal planet'],
-            'paramount': ['paramount network', 'paramount+'],
-            'peacock': ['nbc peacock'],
-            'hulu': ['hulu live'],
-            'netflix': ['netflix channel'],
-        }
-        
-        # Combine all synonym dictionaries
-        all_synonyms = {
-            **sports_synonyms,
-            **news_synonyms,
-            **entertainment_synonyms,
-            **regional_synonyms,
-            **network_synonyms,
-            **nsfw_synonyms,
-            **tv_channel_synonyms
-        }
-        
-        # Find and add synonyms
-        for key, synonyms in all_synonyms.items():
-            if query_lower == key or query_lower in key:
-                expanded_terms.extend(synonyms)
-                break
-            elif query_lower in synonyms:
-                expanded_terms.append(key)
-                expanded_terms.extend([s for s in synonyms if s != query_lower])
-                break
-        
-        # Remove duplicates while preserving order
-        seen = set()
-        unique_terms = []
-        for term in expanded_terms:
-            if term not in seen:
-                seen.add(term)
-                unique_terms.append(term)
-        
-        return unique_terms
+        return expand_search_terms(query)
     
-    def test_iptv_link(self, link, timeout=5, show_progress=True):
-        """Enhanced test to ensure IPTV link is truly playable"""
+    def _claim_link(self, link):
+        """Decide whether a link still needs testing"""
         # Skip if already tested
         if link in self.checked_urls:
             return False
@@ -258,229 +204,424 @@ class IPTVScraper:
         if not self._is_valid_stream_url(link):
             return False
         
-        self.checked_urls.add(link)
-        self.total_tested += 1
+        # Only one of the threads racing for the same link gets to test it
+        return self.checked_urls.add_new(link)
+    
+    def _precheck_link(self, link, details=None):
+        """Settle a link without a probe when possible.
+        
+        Returns True or False when the link is decided (already seen, invalid,
+        cached result, or host skipped by the circuit breaker), or None when it
+        has to be probed. A link that worked in an earlier run gets that
+        probe's details.
+        """
+        if not self._claim_link(link):
+            return False
+        
+        if self._known_unresolvable(link):
+            return False
+        
+        cached = self._cached_verdict(link, details)
+        if cached is not None:
+            return cached
         
+        if not self.breaker.allow(self._extract_domain(link)):
+            # Never probed: a later run sharing the --dedup-file still has to test it
+            self.checked_urls.discard(link)
+            return False
+        return None
+    
+    def test_iptv_link(self, link, timeout=5, show_progress=True, details=None):
+        """Enhanced test to ensure IPTV link is truly playable"""
+        verdict = self._precheck_link(link, details)
+        if verdict is not None:
+            return verdict
+        return self._check_link(link, timeout, details)
+    
+    def _check_link(self, link, timeout=5, details=None):
+        """Probe a claimed link at the configured validation level and record the outcome"""
+        started = time.time()
+        ok, reason = self._probe_link(link, timeout, self.validation, details)
+        self._record_result(link, ok, reason, time.time() - started, details=details)
+        return ok
+    
+    def _screen_link(self, link, timeout=5):
+        """First pass of two-pass validation: quick-probe a claimed link.
+        
+        Failures are recorded as final; a link that passes still has to be
+        checked with _check_link().
+        """
+        started = time.time()
+        ok, reason = self._probe_link(link, timeout, 'quick')
+        if not ok:
+            self._record_result(link, ok, reason, time.time() - started, 'quick')
+        return ok
+    
+    def _known_unresolvable(self, link, prefetch=False):
+        """True when the link's host name is known not to exist.
+        
+        With prefetch, a host not looked up yet starts resolving in the
+        background.
+        """
+        if self.dns is None:
+            return False
+        try:
+            host = urlparse(link).hostname
+        except ValueError:
+            return False
+        if self.dns.is_dead(host):
+            with self.lock:
+                self.dns_skipped.add(link)
+            return True
+        if prefetch:
+            self.dns.prefetch(host)
+        return False
+    
+    @property
+    def total_tested(self):
+        return self.tested.value
+    
+    def _stopping(self):
+        return self.stop_event.is_set() or self.shutdown_flag.is_set()
+    
+    def _cached_verdict(self, link, details=None):
+        """Get a recent result for a link from the result cache, or None to test it"""
+        if self.result_cache is None:
+            return None
+        ok = self.result_cache.get(link, self.validation, details)
+        if ok is not None:
+            with self.lock:
+                self.cached_results[ok] += 1
+            if ok and self.compact_dedup:
+                self.checked_urls.forget_later(link)
+        return ok
+    
+    def _record_result(self, link, ok, reason, latency, level=None, details=None):
+        """Count a finished probe and cache its outcome with the level it was tested at"""
+        if not ok and self._stopping():
+            # Probe cut short on stop, says nothing about the link: a later
+            # run sharing the --dedup-file still has to test it
+            self.checked_urls.discard(link)
+            return
+        if ok and self.compact_dedup:
+            # Only failures stay claimed for later runs sharing the --dedup-file
+            self.checked_urls.forget_later(link)
+        self.tested.add()
+        self.breaker.record(self._extract_domain(link), reason)
+        if self.result_cache is not None:
+            self.result_cache.record(link, ok, reason, latency, level or self.validation, details)
+    
+    @contextlib.contextmanager
+    def _interruptible(self, deadline=None):
+        """Give requests hooks that put every response under the watchdog.
+        
+        Until the block exits, reads of those responses are cut off once the
+        scraper is stopping or the deadline (a time.time() value) has passed.
+        """
+        opened = []
+        
+        def track(response, *args, **kwargs):
+            opened.append(response)
+            with self.lock:
+                self.open_responses[response] = deadline
+                if self.watchdog is None:
+                    self.watchdog = threading.Thread(target=self._watch_responses, daemon=True)
+                    self.watchdog.start()
+        
+        try:
+            yield {'response': track}
+        finally:
+            with self.lock:
+                for response in opened:
+                    self.open_responses.pop(response, None)
+            for response in opened:
+                response.close()
+    
+    def _watch_responses(self):
+        """Shut down the sockets of responses that have to stop being read.
+        
+        A blocked read only notices a closed socket once it times out, and a
+        server trickling bytes never lets it time out, so the socket is shut
+        down under it instead.
+        """
+        while True:
+            time.sleep(0.2)
+            now = time.time()
+            stopping = self._stopping()
+            with self.lock:
+                expired = [response for response, deadline in self.open_responses.items()
+                           if stopping or (deadline is not None and now > deadline)]
+                for response in expired:
+                    del self.open_responses[response]
+            for response in expired:
+                try:
+                    response.raw._fp.fp.raw._sock.shutdown(socket.SHUT_RDWR)
+                except Exception:
+                    pass  # Already closed, or not a plain socket response
+    
+    def _probe_link(self, link, timeout=5, level='standard', details=None):
+        """Fetch a link and run the playlist/segment checks from iptv_scraper.validate.
+        
+        level is one of validate.LEVELS. Returns (ok, reason) where reason
+        says why the link was rejected. The probe is abandoned once the
+        scraper is stopping ('cancelled') or after validate.PROBE_DEADLINE
+        seconds, plus the reload waits of deep validation ('timeout').
+        For a master playlist the variants found go into the details dict,
+        if given: 'renditions' (all, cheapest first) and 'rendition' (the
+        one probed); a working link also gets its 'metrics'
+        (validate.StreamTimer.metrics()).
+        """
+        deadline = time.time() + validate.PROBE_DEADLINE
+        if level == 'deep':
+            deadline += 2 * validate.RELOAD_WAIT_MAX
+        with self._interruptible(deadline) as hooks:
+            return self._probe_responses(link, timeout, hooks, deadline, level, details)
+    
+    def _probe_responses(self, link, timeout, hooks, deadline, level, details):
+        """Body of _probe_link; every request passes the watchdog hooks"""
         # Track domain stats
         domain = self._extract_domain(link)
+        headers = STREAM_HEADERS
+        
+        def halted():
+            if self._stopping():
+                return 'cancelled'
+            if time.time() > deadline:
+                return 'timeout'
+            return None
+        
+        timer = validate.StreamTimer()
+        
+        def passed(bitrate=None):
+            if details is not None:
+                details['metrics'] = timer.metrics(bitrate)
+            return True, 'ok'
         
         try:
-            headers = {
-                'User-Agent': 'VLC/3.0.18 LibVLC/3.0.18',
-                'Accept': '*/*',
-                'Accept-Encoding': 'gzip, deflate',
-                'Connection': 'keep-alive'
-            }
-            
             # Step 1: Check if URL is accessible (use session for connection pooling)
-            response = self.session.get(link, timeout=timeout, stream=True, allow_redirects=True, headers=headers, verify=False)
+            response = self.session.get(link, timeout=timeout, stream=True, allow_redirects=True, headers=headers, verify=False, hooks=hooks)
+            timer.response()
             
             if response.status_code != 200:
                 self._update_domain_stats(domain, False)
-                return False
+                return False, f'http-{response.status_code}'
             
             content_type = response.headers.get('content-type', '').lower()
-            content_length = response.headers.get('content-length', '0')
             
             # Reject suspiciously small content
-            if content_length.isdigit() and int(content_length) < 500:
+            if validate.too_small(response.headers.get('content-length', '0')):
                 self._update_domain_stats(domain, False)
-                return False
+                return False, 'too-small'
             
             # Step 2: For M3U8 playlists, perform fast validation
-            if link.endswith('.m3u8') or link.endswith('.m3u') or 'mpegurl' in content_type:
+            if validate.is_playlist(link, content_type):
                 try:
-                    # Read first 32KB for faster validation
+                    # Read first 32KB for faster validation (4KB for a quick probe)
                     content_chunks = []
                     bytes_read = 0
-                    max_bytes = 32768  # 32KB (reduced from 100KB for speed)
+                    probe_bytes = validate.QUICK_PROBE_BYTES if level == 'quick' else validate.PLAYLIST_PROBE_BYTES
                     
-                    for chunk in response.iter_content(8192):
+                    for chunk in response.iter_content(min(8192, probe_bytes)):
+                        if halted():
+                            return False, halted()
                         content_chunks.append(chunk)
                         bytes_read += len(chunk)
-                        if bytes_read >= max_bytes:
+                        if bytes_read >= probe_bytes:
                             break
                     
                     content = b''.join(content_chunks).decode('utf-8', errors='ignore')
+                    variants = validate.playlist_variants(link, content)
+                    if variants and details is not None:
+                        details['renditions'] = variants
+                        details['rendition'] = variants[0]
                     
-                    # Check for error indicators in response
-                    error_indicators = [
-                        'not found',
-                        '404',
-                        'error',
-                        'forbidden',
-                        'access denied',
-                        'moose_na',  # Known placeholder
-                        'unavailable',
-                        'offline',
-                        'geo-block',
-                        'restricted'
-                    ]
-                    
-                    content_lower = content.lower()
-                    for indicator in error_indicators:
-                        if indicator in content_lower:
-                            return False
-                    
-                    # Must have M3U header
-                    if '#EXTM3U' not in content:
-                        return False
-                    
-                    # Check for valid M3U8 tags
-                    has_valid_tags = any(tag in content for tag in [
-                        '#EXT-X-STREAM-INF',
-                        '#EXTINF:',
-                        '#EXT-X-TARGETDURATION'
-                    ])
-                    
-                    if not has_valid_tags:
-                        return False
-                    
-                    # Extract stream URLs from playlist
-                    lines = content.split('\n')
-                    stream_urls = []
-                    
-                    for line in lines:
-                        line = line.strip()
-                        # Look for actual stream URLs
-                        if line and not line.startswith('#'):
-                            if line.startswith('http'):
-                                stream_urls.append(line)
-                            elif line.endswith('.ts') or line.endswith('.m4s') or line.endswith('.m3u8'):
-                                # Relative URL - construct full URL
-                                base_url = link.rsplit('/', 1)[0]
-                                stream_urls.append(f"{base_url}/{line}")
+                    # Quick probe: the playlist header is all we look at
+                    if level == 'quick':
+                        return passed() if validate.playlist_header_ok(content) else (False, 'bad-playlist')
                     
-                    # Must have at least one stream URL
+                    # Must be a real playlist listing at least one stream URL
+                    stream_urls = validate.playlist_stream_urls(link, content)
                     if not stream_urls:
-                        return False
+                        return False, 'bad-playlist'
                     
-                    # Step 3: Test actual stream segment (first one)
-                    test_url = stream_urls[0]
+                    # Step 3: Test actual stream segment (first one, or the
+                    # lowest-bandwidth variant of a master playlist)
+                    test_url = variants[0]['url'] if variants else stream_urls[0]
+                    media_url, media_content = link, content  # Reloaded by deep validation
                     
                     # If it's another .m3u8, we need to go deeper (nested playlist)
-                    if test_url.endswith('.m3u8'):
+                    if validate.is_playlist_url(test_url):
+                        if halted():
+                            return False, halted()
                         try:
-                            playlist_response = self.session.get(test_url, timeout=5, headers=headers, verify=False)
-                            if playlist_response.status_code != 200:
-                                return False
-                            
-                            playlist_content = playlist_response.text
-                            
-                            # Check for errors in nested playlist too
-                            for indicator in error_indicators:
-                                if indicator in playlist_content.lower():
-                                    return False
+                            fetched = self.playlist_cache.fetch(
+                                test_url, lambda url: self._fetch_playlist(url, hooks), halted)
+                            if fetched is None:
+                                return False, halted()
+                            status, text = fetched
+                            if status != 200:
+                                return False, f'nested-http-{status}'
                             
-                            # Find first actual segment
-                            for pline in playlist_content.split('\n'):
-                                pline = pline.strip()
-                                if pline and not pline.startswith('#'):
-                                    if pline.startswith('http'):
-                                        test_url = pline
-                                    else:
-                                        base_url = test_url.rsplit('/', 1)[0]
-                                        test_url = f"{base_url}/{pline}"
-                                    break
-                            
-                            # If still .m3u8, reject (too many nested levels)
-                            if test_url.endswith('.m3u8'):
-                                return False
+                            media_url, media_content = test_url, text
+                            test_url = validate.nested_segment_url(test_url, media_content)
+                            if test_url is None:
+                                return False, 'bad-nested-playlist'
                                 
                         except:
-                            return False
+                            return False, 'nested-error'
                     
                     # Step 4: Test the actual stream segment
+                    if halted():
+                        return False, halted()
                     try:
-                        segment_response = self.session.get(test_url, timeout=5, stream=True, headers=headers, verify=False)
+                        segment_response = self.session.get(test_url, timeout=5, stream=True, headers=headers, verify=False, hooks=hooks)
+                        timer.data_response()
                         if segment_response.status_code != 200:
-                            return False
-                        
-                        # Check content type of segment
-                        seg_content_type = segment_response.headers.get('content-type', '').lower()
+                            return False, f'segment-http-{segment_response.status_code}'
                         
                         # Should be video or stream data, not text/html
-                        if 'text/html' in seg_content_type or 'text/plain' in seg_content_type:
-                            return False
-                        
-                        # Read multiple chunks to ensure it's real video data
-                        chunks_read = 0
-                        total_bytes = 0
-                        valid_data = False
-                        
-                        for chunk in segment_response.iter_content(16384):
-                            if chunk:
-                                chunks_read += 1
-                                total_bytes += len(chunk)
-                                
-                                # On first chunk, validate it's video data
-                                if chunks_read == 1:
-                                    # For .ts files, check for MPEG-TS packet signature
-                                    if test_url.endswith('.ts'):
-                                        # MPEG-TS packets start with 0x47 (sync byte)
-                                        if len(chunk) > 0 and chunk[0] == 0x47:
-                                            valid_data = True
-                                        else:
-                                            return False
-                                    else:
-                                        # For other formats, just ensure it's binary data
-                                        valid_data = True
-                                
-                                # Read at least 2 chunks (32KB)
-                                if chunks_read >= 2:
-                                    break
+                        seg_content_type = segment_response.headers.get('content-type', '').lower()
+                        if not validate.segment_content_type_ok(seg_content_type):
+                            return False, 'segment-not-video'
                         
-                        # Must have received substantial valid data
-                        if not valid_data or total_bytes < 16384:  # At least 16KB
-                            self._update_domain_stats(domain, False)
-                            return False
+                        # Read until the data proves (or disproves) to be video
+                        ok, reason = self._inspect_segment(segment_response, test_url, halted, timer)
+                        if not ok:
+                            if reason == 'segment-short':
+                                self._update_domain_stats(domain, False)
+                            return False, reason
                         
-                        self._update_domain_stats(domain, True)
-                        return True
+                        # Ranking compares throughput, which needs more than the first packets
+                        if self.rank:
+                            self._read_on(segment_response, validate.THROUGHPUT_PROBE_BYTES, halted, timer)
                         
                     except:
-                        return False
+                        return False, 'segment-error'
+                    
+                    # Step 5 (deep): a live playlist must move on when reloaded
+                    if level == 'deep':
+                        ok, reason = self._check_playlist_advances(media_url, media_content, hooks, halted)
+                        if not ok:
+                            self._update_domain_stats(domain, False)
+                            return False, reason
+                    
+                    self._update_domain_stats(domain, True)
+                    return passed(variants[0]['bandwidth'] if variants else None)
                     
                 except Exception as e:
-                    return False
+                    return False, 'error'
             
             # Step 2b: For direct streams, validate video data
-            elif 'video' in content_type or 'stream' in content_type or 'octet-stream' in content_type:
+            elif validate.is_direct_stream(content_type):
+                if level == 'quick':
+                    return passed()
                 try:
                     # Read more data to ensure it's a real stream
-                    chunks_read = 0
                     total_bytes = 0
+                    probe_bytes = validate.DIRECT_STREAM_PROBE_BYTES
+                    if self.rank:
+                        probe_bytes = max(probe_bytes, validate.THROUGHPUT_PROBE_BYTES)
+                    timer.data_response()
                     
-                    for chunk in response.iter_content(16384):
+                    for chunk in response.iter_content(validate.SEGMENT_CHUNK_BYTES):
+                        if halted():
+                            return False, halted()
                         if chunk:
-                            chunks_read += 1
                             total_bytes += len(chunk)
+                            timer.data(len(chunk))
                             
                             # Read at least 3 chunks (48KB)
-                            if chunks_read >= 3:
+                            if total_bytes >= probe_bytes:
                                 break
                     
                     # Must have received substantial data
-                    if total_bytes >= 32768:  # At least 32KB
+                    if total_bytes >= validate.DIRECT_STREAM_MIN_BYTES:
                         self._update_domain_stats(domain, True)
-                        return True
+                        return passed()
                     else:
                         self._update_domain_stats(domain, False)
-                        return False
+                        return False, 'stream-short'
                     
                 except:
                     self._update_domain_stats(domain, False)
-                    return False
+                    return False, 'stream-error'
             
             self._update_domain_stats(domain, False)
-            return False
+            return False, 'not-a-stream'
             
         except requests.exceptions.Timeout:
-            return False
+            return False, 'timeout'
         except requests.exceptions.ConnectionError:
-            return False
+            return False, 'connection-error'
         except Exception as e:
-            return False
+            return False, 'error'
+    
+    def _fetch_playlist(self, url, hooks):
+        """Fetch a nested playlist for the playlist cache, as (status code, text)"""
+        response = self.session.get(url, timeout=5, stream=True, headers=STREAM_HEADERS, verify=False, hooks=hooks)
+        return response.status_code, response.text if response.status_code == 200 else ''
+    
+    def _inspect_segment(self, response, segment_url, halted, timer):
+        """Read a segment response into a validate.SegmentInspector until it decides"""
+        inspector = validate.SegmentInspector(segment_url)
+        raw = response.raw
+        encoded = response.headers.get('content-encoding', 'identity').lower() != 'identity'
+        pending = b''  # Decoded bytes that did not fit the last step
+        while True:
+            if halted():
+                return False, halted()
+            space = inspector.space()
+            if encoded:
+                # urllib3 1.x counts compressed bytes in read(amt): a step may
+                # decode to more than asked for, or to nothing before the end
+                while not pending and not raw.closed:
+                    if halted():
+                        return False, halted()
+                    pending = raw.read(len(space), decode_content=True)
+                count = min(len(space), len(pending))
+                space[:count] = pending[:count]
+                pending = pending[count:]
+            else:
+                count = raw.readinto(space)  # Straight into the inspector's buffer
+            timer.data(count)
+            verdict = inspector.feed(count)
+            if verdict is not None:
+                return verdict
+    
+    def _read_on(self, response, limit, halted, timer):
+        """Keep reading a working segment until limit bytes in all, to measure its throughput"""
+        try:
+            while timer.received < limit and not halted():
+                count = len(response.raw.read(validate.SEGMENT_READ_STEP, decode_content=True))
+                if not count and response.raw.closed:
+                    break
+                timer.data(count)
+        except Exception:
+            pass  # The link is already judged; the measurement just ends early
+    
+    def _check_playlist_advances(self, playlist_url, content, hooks, halted):
+        """Deep validation: reload a live media playlist until it moves on (twice at most)"""
+        if not validate.is_live_playlist(content):
+            return True, 'ok'  # VOD or an ended event: complete, nothing to advance
+        
+        for _ in range(2):
+            reload_at = time.time() + validate.reload_delay(content)
+            while time.time() < reload_at:
+                if halted():
+                    return False, halted()
+                time.sleep(min(0.2, max(0, reload_at - time.time())))
+            
+            try:
+                response = self.session.get(playlist_url, timeout=5, stream=True, headers=STREAM_HEADERS, verify=False, hooks=hooks)
+                if response.status_code != 200:
+                    return False, f'reload-http-{response.status_code}'
+                reloaded = response.text
+            except Exception:
+                return False, 'reload-error'
+            
+            if validate.playlist_advanced(content, reloaded):
+                return True, 'ok'
+        return False, 'stale-playlist'
     
     def _is_valid_stream_url(self, url):
         """Quick validation to reject obviously invalid URLs"""
@@ -520,47 +661,17 @@ class IPTVScraper:
     
     def _update_domain_stats(self, domain, success):
         """Track domain success rates for prioritization"""
-        if domain not in self.domain_stats:
-            self.domain_stats[domain] = {'success': 0, 'total': 0}
-        
-        self.domain_stats[domain]['total'] += 1
-        if success:
-            self.domain_stats[domain]['success'] += 1
+        with self.lock:
+            if domain not in self.domain_stats:
+                self.domain_stats[domain] = {'success': 0, 'total': 0}
+            
+            self.domain_stats[domain]['total'] += 1
+            if success:
+                self.domain_stats[domain]['success'] += 1
     
     def extract_urls_from_text(self, text):
         """Extract potential IPTV URLs from text with advanced patterns"""
-        patterns = [
-            # Standard streaming URLs (m3u8, ts, mpd, etc.)
-            r'https?://[^\s<>"{}|\\^\[\]`]+\.(?:m3u8?|ts|mpd|mpegurl|stream|aac|mp3|mp4|flv)',
-            # IP-based streaming (common IPTV ports)
-            r'https?://(?:\d{1,3}\.){3}\d{1,3}(?::\d+)?/[^\s<>"{}|\\^\[\]`]*',
-            # HLS/DASH patterns
-            r'https?://[^\s<>"{}|\\^\[\]`]+/(?:hls|dash|live|stream|channel|tv|playlist)/[^\s<>"{}|\\^\[\]`]+',
-            # M3U8 with query parameters
-            r'https?://[^\s<>"{}|\\^\[\]`]+\.m3u8\?[^\s<>"{}|\\^\[\]`]*',
-            # TS streams with path patterns (like iptv.am000.tv)
-            r'https?://[^\s<>"{}|\\^\[\]`]+/live/[^\s<>"{}|\\^\[\]`]+/[^\s<>"{}|\\^\[\]`]+/\d+\.ts',
-            # CDN patterns (CloudFront, Akamai, etc.)
-            r'https?://[^\s<>"{}|\\^\[\]`]*\.(?:cloudfront\.net|akamaihd\.net|cdn\d*\.|edge\d*\.|stream\d*\.)[^\s<>"{}|\\^\[\]`]+',
-            # Sports streaming specific (BeIN, DAZN, ESPN, etc.)
-            r'https?://[^\s<>"{}|\\^\[\]`]*(?:bein|dazn|espn|sky|sport)[^\s<>"{}|\\^\[\]`]*\.(?:m3u8?|ts)[^\s<>"{}|\\^\[\]`]*',
-            # Encoded URLs (URL in query params)
-            r'https?://[^\s<>"{}|\\^\[\]`]*[?&](?:url|src|stream|link)=https?[^\s<>"{}|\\^\[\]`]+',
-            # Albaplayer and similar player URLs
-            r'https?://[^\s<>"{}|\\^\[\]`]*(?:albaplayer|player|embed)/[^\s<>"{}|\\^\[\]`]+',
-            # Alkoora and yalllashoot domains
-            r'https?://[^\s<>"{}|\\^\[\]`]*\.(?:alkoora\.live|yalllashoot\.today)[^\s<>"{}|\\^\[\]`]*',
-            # IPTV server patterns (common IPTV hosting)
-            r'https?://[^\s<>"{}|\\^\[\]`]*\.(?:tv|live|stream):\d+/[^\s<>"{}|\\^\[\]`]+',
-        ]
-        
-        urls = []
-        for pattern in patterns:
-            urls.extend(re.findall(pattern, text, re.IGNORECASE))
-        
-        # Filter and clean
-        unique_urls = list(set(urls))
-        return [url for url in unique_urls if url.startswith('http') and len(url) > 15]
+        return find_stream_urls(text)
     
     def scan_ip_range_for_streams(self, base_ip, channel_name, max_to_find=5):
         """Scan IP addresses for common IPTV streaming patterns"""
@@ -613,8 +724,6 @@ class IPTVScraper:
             })
             
             if response.status_code == 200:
-                soup = BeautifulSoup(response.text, 'html.parser')
-                
                 # Find all stream URLs
                 urls = self.extract_urls_from_text(response.text)
                 
@@ -634,49 +743,10 @@ class IPTVScraper:
     
     def extract_iframe_streams(self, html_content):
         """Extract streaming URLs from iframes and embed tags"""
-        stream_urls = []
-        
         try:
-            soup = BeautifulSoup(html_content, 'html.parser')
-            
-            # Find all iframes
-            iframes = soup.find_all('iframe')
-            for iframe in iframes:
-                src = iframe.get('src') or iframe.get('data-src')
-                if src:
-                    if src.startswith('//'):
-                        src = 'https:' + src
-                    elif src.startswith('/'):
-                        continue  # Relative URLs need base URL
-                    stream_urls.append(src)
-            
-            # Find embed tags
-            embeds = soup.find_all('embed')
-            for embed in embeds:
-                src = embed.get('src')
-                if src and src.startswith('http'):
-                    stream_urls.append(src)
-            
-            # Find video sources
-            videos = soup.find_all('video')
-            for video in videos:
-                sources = video.find_all('source')
-                for source in sources:
-                    src = source.get('src')
-                    if src and src.startswith('http'):
-                        stream_urls.append(src)
-            
-            # Look for data attributes with streaming URLs
-            for tag in soup.find_all(attrs={'data-stream': True}):
-                stream_urls.append(tag['data-stream'])
-            
-            for tag in soup.find_all(attrs={'data-url': True}):
-                stream_urls.append(tag['data-url'])
-                
+            return list(HTMLPage(html_content).embedded_urls)
         except Exception as e:
-            pass
-        
-        return stream_urls
+            return []
     
     def scrape_albaplayer_channels(self, num_needed):
         """Scrape albaplayer streaming platforms (alkoora.live, yalllashoot.today)"""
@@ -797,12 +867,13 @@ class IPTVScraper:
                 response = requests.get(site, timeout=15, headers=headers, allow_redirects=True)
                 
                 if response.status_code == 200:
+                    page = HTMLPage(response.text)
+                    
                     # Extract URLs from page content
-                    all_urls = self.extract_urls_from_text(response.text)
+                    all_urls = list(page.stream_urls)
                     
                     # Extract iframe streams
-                    iframe_urls = self.extract_iframe_streams(response.text)
-                    all_urls.extend(iframe_urls)
+                    all_urls.extend(page.embedded_urls)
                     
                     # Also look for API endpoints in JavaScript
                     js_pattern = r'(?:src|source|stream|url)["\']\s*:\s*["\']([^"\']+\.m3u8?[^"\']*)["\']'
@@ -1125,45 +1196,95 @@ class IPTVScraper:
             
             try:
                 print(colored(f"[*] Checking direct M3U: {site_url.split('/')[2]}...", "cyan"))
-                response = requests.get(site_url, timeout=10)
+                response = self.session.get(site_url, timeout=10, stream=True)
                 
                 if response.status_code == 200:
-                    # Parse as M3U
-                    lines = response.text.split('\n')
-                    current_name = ""
-                    
-                    for line in lines:
-                        line = line.strip()
-                        
-                        if line.startswith('#EXTINF'):
-                            current_name = line.split(',')[-1].strip() if ',' in line else ""
+                    # Parse as M3U while it downloads
+                    for entry in parse_m3u(response.iter_lines()):
+                        if not entry.url.startswith('http'):
+                            continue
                         
-                        elif line and not line.startswith('#') and line.startswith('http'):
-                            if not channel_name or channel_name.lower() in current_name.lower() or channel_name.lower() in line.lower():
-                                
-                                status_msg = f"[{self.total_tested}] Testing: {(current_name or line)[:45]}..."
-                                print(colored(status_msg, "white"), end=" ")
-                                
-                                if self.test_iptv_link(line):
-                                    self.total_working += 1
-                                    print(colored(f"✓ [{self.total_working}/{num_needed}]", "green"))
-                                    self.scraped_links.append({
-                                        'title': current_name or 'Stream',
-                                        'url': line
-                                    })
-                                    found += 1
-                                    
-                                    if found >= num_needed:
-                                        return found
-                                else:
-                                    print(colored("✗", "red"))
+                        current_name = entry.title
+                        line = entry.url
+                        if not channel_name or channel_name.lower() in current_name.lower() or channel_name.lower() in line.lower():
+                            
+                            status_msg = f"[{self.total_tested}] Testing: {(current_name or line)[:45]}..."
+                            print(colored(status_msg, "white"), end=" ")
                             
-                            current_name = ""
+                            if self.test_iptv_link(line):
+                                self.total_working += 1
+                                print(colored(f"✓ [{self.total_working}/{num_needed}]", "green"))
+                                self.scraped_links.append({
+                                    'title': current_name or 'Stream',
+                                    'url': line
+                                })
+                                found += 1
+                                
+                                if found >= num_needed:
+                                    response.close()
+                                    return found
+                            else:
+                                print(colored("✗", "red"))
+                
+                response.close()
             except:
                 continue
         
         return found
     
+    def _github_get(self, url, accept='application/vnd.github+json'):
+        """GET from the GitHub API, authenticated when GITHUB_TOKEN is set"""
+        headers = {'Accept': accept}
+        token = os.environ.get('GITHUB_TOKEN')
+        if token:
+            headers['Authorization'] = f'token {token}'
+        return self.session.get(url, timeout=10, headers=headers)
+    
+    def _find_repo_playlists(self, repo):
+        """List the M3U playlists of a repo from one recursive tree lookup"""
+        repo_name = repo['full_name']
+        branch = repo.get('default_branch', 'master')
+        pushed_at = repo.get('pushed_at')
+        
+        if self.repo_cache is not None:
+            cached = self.repo_cache.lookup(repo_name, pushed_at=pushed_at)
+            if cached is not None:
+                return cached
+        
+        # Head commit of the default branch (the sha media type returns just the hash)
+        response = self._github_get(
+            f"https://api.github.com/repos/{repo_name}/commits/{quote(branch, safe='')}",
+            accept='application/vnd.github.sha'
+        )
+        if response.status_code != 200:
+            return []
+        sha = response.text.strip()
+        
+        if self.repo_cache is not None:
+            cached = self.repo_cache.lookup(repo_name, sha=sha)
+            if cached is not None:
+                self.repo_cache.store(repo_name, pushed_at, sha, cached)
+                return cached
+        
+        response = self._github_get(f"https://api.github.com/repos/{repo_name}/git/trees/{sha}?recursive=1")
+        if response.status_code != 200:
+            return []
+        
+        paths = [
+            item['path'] for item in response.json().get('tree', [])
+            if item.get('type') == 'blob' and item.get('path', '').lower().endswith(('.m3u', '.m3u8'))
+        ]
+        # Top-level playlists first; very large repos are capped
+        paths.sort(key=lambda path: (path.count('/'), path))
+        playlists = [
+            f"https://raw.githubusercontent.com/{repo_name}/{branch}/{quote(path)}"
+            for path in paths[:GITHUB_MAX_PLAYLISTS_PER_REPO]
+        ]
+        
+        if self.repo_cache is not None:
+            self.repo_cache.store(repo_name, pushed_at, sha, playlists)
+        return playlists
+    
     def search_github_repos(self, query="iptv m3u"):
         """Search GitHub for new IPTV repositories"""
         additional_sources = []
@@ -1171,94 +1292,88 @@ class IPTVScraper:
         try:
             # Search GitHub API for IPTV repos (silent - spinner handles this)
             search_url = f"https://api.github.com/search/repositories?q={query}+in:name&sort=updated&per_page=10"
-            response = requests.get(search_url, timeout=10)
+            response = self._github_get(search_url)
             
             if response.status_code == 200:
-                data = response.json()
-                for repo in data.get('items', []):
-                    # Try to find M3U files in the repo
-                    repo_name = repo['full_name']
-                    default_branch = repo.get('default_branch', 'master')
-                    
-                    # Common M3U file locations
-                    possible_files = [
-                        f"https://raw.githubusercontent.com/{repo_name}/{default_branch}/playlist.m3u",
-                        f"https://raw.githubusercontent.com/{repo_name}/{default_branch}/playlist.m3u8",
-                        f"https://raw.githubusercontent.com/{repo_name}/{default_branch}/live.m3u",
-                        f"https://raw.githubusercontent.com/{repo_name}/{default_branch}/channels.m3u",
-                        f"https://raw.githubusercontent.com/{repo_name}/{default_branch}/streams.m3u",
-                        f"https://raw.githubusercontent.com/{repo_name}/{default_branch}/stream.m3u",
-                        # Sports specific
-                        f"https://raw.githubusercontent.com/{repo_name}/{default_branch}/bein.m3u",
-                        f"https://raw.githubusercontent.com/{repo_name}/{default_branch}/beinsports.m3u",
-                        f"https://raw.githubusercontent.com/{repo_name}/{default_branch}/sports.m3u",
-                        f"https://raw.githubusercontent.com/{repo_name}/{default_branch}/sport.m3u",
-                        f"https://raw.githubusercontent.com/{repo_name}/{default_branch}/espn.m3u",
-                        f"https://raw.githubusercontent.com/{repo_name}/{default_branch}/sky.m3u",
-                        f"https://raw.githubusercontent.com/{repo_name}/{default_branch}/dazn.m3u",
-                        f"https://raw.githubusercontent.com/{repo_name}/{default_branch}/football.m3u",
-                        f"https://raw.githubusercontent.com/{repo_name}/{default_branch}/soccer.m3u",
-                        f"https://raw.githubusercontent.com/{repo_name}/{default_branch}/streamio.m3u",
-                    ]
-                    
-                    for url in possible_files:
-                        try:
-                            test_response = requests.head(url, timeout=5)
-                            if test_response.status_code == 200:
-                                additional_sources.append(url)
-                        except:
-                            continue
+                repos = response.json().get('items', [])
+                
+                # One tree listing per repo, all repos at once
+                with ThreadPoolExecutor(max_workers=max(1, min(len(repos), 10))) as executor:
+                    for playlists in executor.map(self._safe_find_repo_playlists, repos):
+                        additional_sources.extend(playlists)
+                
+                if self.repo_cache is not None:
+                    self.repo_cache.save()
         except:
             pass
         
         return additional_sources
     
+    def _safe_find_repo_playlists(self, repo):
+        try:
+            return self._find_repo_playlists(repo)
+        except Exception:
+            return []
+    
+    def _load_channel_names(self, channel_name):
+        """Map iptv-org channel IDs to names, keeping only channels matching channel_name"""
+        channel_names = {}
+        try:
+            response = self.session.get("https://iptv-org.github.io/api/channels.json", timeout=15, stream=True)
+            if response.status_code == 200:
+                wanted = channel_name.lower() if channel_name else None
+                for item in iter_json_array(response.iter_content(65536)):
+                    if not isinstance(item, dict) or not item.get('id'):
+                        continue
+                    name = item.get('name') or item['id']
+                    if wanted is None or wanted in name.lower():
+                        channel_names[item['id']] = name
+            response.close()
+        except Exception:
+            pass
+        return channel_names
+    
     def scrape_json_apis(self, channel_name, num_needed):
         """Scrape from JSON API endpoints"""
         found = 0
         
-        # IPTV API endpoints (public)
-        api_endpoints = [
-            "https://iptv-org.github.io/api/streams.json",
-            "https://iptv-org.github.io/api/channels.json",
-        ]
+        # channels.json carries names only; it is read first into a compact
+        # ID -> name index that streams.json is joined against
+        print(colored("[*] Querying API: channels.json...", "cyan"))
+        channel_names = self._load_channel_names(channel_name)
         
-        for api_url in api_endpoints:
-            if found >= num_needed:
-                break
+        try:
+            print(colored("[*] Querying API: streams.json...", "cyan"))
+            response = self.session.get("https://iptv-org.github.io/api/streams.json", timeout=15, stream=True)
             
-            try:
-                print(colored(f"[*] Querying API: {api_url.split('/')[-1]}...", "cyan"))
-                response = requests.get(api_url, timeout=15)
-                
-                if response.status_code == 200:
-                    data = response.json()
+            if response.status_code == 200:
+                # Items are tested as they arrive instead of after the whole download
+                for item in iter_json_array(response.iter_content(65536)):
+                    if found >= num_needed or self.shutdown_flag.is_set():
+                        break
+                    if not isinstance(item, dict):
+                        continue
                     
-                    # Handle different JSON structures
-                    items = data if isinstance(data, list) else data.get('items', [])
+                    # Extract URL and name from various JSON formats
+                    url = item.get('url') or item.get('stream') or item.get('link')
+                    channel_id = item.get('channel')
+                    name = item.get('name') or item.get('title') or channel_names.get(channel_id) or channel_id
                     
-                    for item in items:
-                        if found >= num_needed:
-                            break
-                        
-                        # Extract URL and name from various JSON formats
-                        url = item.get('url') or item.get('stream') or item.get('link')
-                        name = item.get('name') or item.get('title') or item.get('channel')
+                    if url and (not channel_name or channel_id in channel_names or (name and channel_name.lower() in name.lower())):
+                        print(colored(f"[*] Testing API stream: {name or url[:60]}...", "white"), end=" ")
                         
-                        if url and (not channel_name or (name and channel_name.lower() in name.lower())):
-                            print(colored(f"[*] Testing API stream: {name or url[:60]}...", "white"), end=" ")
-                            
-                            if self.test_iptv_link(url):
-                                print(colored("✓ WORKING", "green"))
-                                self.scraped_links.append({
-                                    'title': name or 'Stream',
-                                    'url': url
-                                })
-                                found += 1
-                            else:
-                                print(colored("✗ Failed", "red"))
-            except:
-                continue
+                        if self.test_iptv_link(url):
+                            print(colored("✓ WORKING", "green"))
+                            self.scraped_links.append({
+                                'title': name or 'Stream',
+                                'url': url
+                            })
+                            found += 1
+                        else:
+                            print(colored("✗ Failed", "red"))
+            response.close()
+        except Exception:
+            pass
         
         return found
     
@@ -1276,10 +1391,10 @@ class IPTVScraper:
                     url += f"?filter={channel_name}"
                 
                 response = requests.get(url, timeout=10)
-                soup = BeautifulSoup(response.text, "html.parser")
+                html_page = HTMLPage(response.text)
                 
                 # Find stream URLs
-                stream_divs = soup.find_all('div', {'class': 'url'})
+                stream_divs = html_page.soup.find_all('div', {'class': 'url'})
                 
                 for div in stream_divs:
                     if found >= num_needed:
@@ -1310,12 +1425,97 @@ class IPTVScraper:
         
         return found
     
+    def _source_host_slot(self, url):
+        """Get the semaphore limiting concurrent source downloads for a host"""
+        host = self._extract_domain(url)
+        with self.lock:
+            slot = self.source_host_slots.get(host)
+            if slot is None:
+                slot = threading.BoundedSemaphore(self.source_host_limit)
+                self.source_host_slots[host] = slot
+        return slot
+    
+    def collect_source(self, source_url, matcher, on_link):
+        """Download one M3U source and pass each link matching the search to on_link.
+        
+        matcher is the query's TermMatcher (None matches everything). on_link
+        returns False when collection should stop. Returns the number of
+        matching links, or None when the source could not be downloaded.
+        """
+        # Downloads are cut off as soon as the scrape is stopping
+        with self._interruptible() as hooks:
+            return self._collect_source(source_url, matcher, on_link, hooks)
+    
+    def _collect_source(self, source_url, matcher, on_link, hooks):
+        with self._source_host_slot(source_url):
+            if self._stopping():
+                return 0
+            if self.source_cache:
+                cached = self.source_cache.fetch(self.session, source_url, timeout=15, cancel=self._stopping, hooks=hooks)
+                if cached is None:
+                    return None
+            else:
+                response = self.session.get(source_url, timeout=15, stream=True, hooks=hooks)
+                if response.status_code != 200:
+                    response.close()
+                    return None
+        
+        # Links only need a title and URL, so #EXTINF attributes are not parsed
+        reindex = None
+        if not self.source_cache:
+            entries = parse_m3u_blocks(iter_entry_blocks(response.iter_content(1 << 20)), matcher, with_attributes=False)
+        elif self.catalog is None:
+            entries = parse_m3u_blocks(iter_entry_blocks(cached.chunks()), matcher, with_attributes=False)
+        else:
+            # The cached body is block-scanned even when the catalog is
+            # current: a per-source catalog search is about twice as slow
+            # (it has to scan the URLs too, and load every match). Changed
+            # sources are re-indexed after the scan, so testing starts
+            # without waiting for every entry to be parsed; without a search
+            # they are indexed on the way through
+            version = str(cached.meta.get('downloaded_at'))
+            entries = parse_m3u_blocks(iter_entry_blocks(cached.chunks()), matcher, with_attributes=False)
+            if not self.catalog.is_current(source_url, version):
+                if matcher is None or matcher.match_all:
+                    entries = self.catalog.index_source(source_url, version, parse_m3u_blocks(iter_entry_blocks(cached.chunks())))
+                else:
+                    reindex = version
+        source_matches = 0
+        
+        try:
+            for entry in entries:
+                # Check for shutdown in inner loop
+                if self._stopping():
+                    break
+                
+                if not entry.url.startswith(('http', 'rtmp')):
+                    continue
+                
+                # Every path above yields only entries the matcher accepts
+                if not on_link({
+                    'url': entry.url,
+                    'title': entry.title or 'Stream'
+                }):
+                    break
+                source_matches += 1
+        finally:
+            if not self.source_cache:
+                response.close()
+        
+        if reindex is not None and not self._stopping():
+            for _ in self.catalog.index_source(source_url, reindex, parse_m3u_blocks(iter_entry_blocks(cached.chunks()))):
+                if self._stopping():
+                    break
+        
+        return source_matches
+    
     def scrape_links(self, channel_name, num_links, nsfw_mode=False):
         """Scrape IPTV links from multiple sources with multi-threading"""
         working_links_found = 0
         
         # Expand search terms
         search_terms = self.expand_search_terms(channel_name) if channel_name else ['']
+        matcher = TermMatcher(search_terms) if channel_name else None
         
         # Add NSFW filter message
         if nsfw_mode:
@@ -1357,102 +1557,87 @@ class IPTVScraper:
             else:
                 spinner.stop(colored(f"[*] GitHub search complete", "cyan"))
         
+        # The same playlist is listed more than once in some source lists
+        m3u_sources = list(dict.fromkeys(m3u_sources))
         total_sources = len(m3u_sources)
-        links_to_test = []
-        
-        # Phase 1: Collect all matching links from sources
-        print(colored(f"\n[Phase 1/2] Collecting links from {total_sources} sources...", "yellow"))
         
-        for idx, source_url in enumerate(m3u_sources, 1):
-            # Check for shutdown
-            if self.shutdown_flag.is_set():
-                print(colored("\n[!] Stopping collection due to user interrupt...", "yellow"))
-                break
-                
-            source_name = source_url.split('/')[-2] if '/' in source_url else source_url[:30]
-            print(colored(f"[{idx}/{total_sources}] ", "cyan") + colored(f"{source_name}...", "white"), end=" ")
-            
-            try:
-                response = requests.get(source_url, timeout=15)
-                if response.status_code != 200:
-                    print(colored("✗ Failed", "red"))
+        # Phase 1 (collection) and Phase 2 (testing) run as a pipeline: every
+        # matching link goes onto a bounded queue as soon as its source line is
+        # parsed, and the testing workers pull from it while downloads continue.
+        # Candidates wait in a priority queue and are tested best-first; it is
+        # deep enough to reorder a good stretch of what the sources produce
+        queue_slots = self.async_concurrency if self.engine == 'async' else self.link_workers
+        scorer = LinkScorer(self.domain_stats, self._extract_domain, self.result_cache, self.breaker, self.validation)
+        limiter = HostLimiter(self.host_limit, self.host_rate)
+        link_queue = LinkScheduler(max(queue_slots * 8, 1000), scorer.score, limiter, self._extract_domain)
+        collection_done = threading.Event()  # All sources finished producing
+        stop_event = self.stop_event  # Target reached; also aborts downloads and probes in flight
+        stop_event.clear()
+        links_collected = [0]
+        should_stop = self._stopping
+        
+        def enqueue_link(link_data):
+            """Hand a matching link to the testers, waiting while the queue is full"""
+            # Links on names that do not exist never take a tester; other
+            # hosts are resolved while their links wait in the queue
+            if self._known_unresolvable(link_data['url'], prefetch=True):
+                return True
+            while not should_stop():
+                try:
+                    link_queue.put(link_data, timeout=0.2)
+                except queue.Full:
                     continue
-                
-                content = response.text
-                lines = content.split('\n')
-                current_name = ""
-                source_matches = 0
-                
-                for line in lines:
-                    # Check for shutdown in inner loop
-                    if self.shutdown_flag.is_set():
-                        break
-                        
-                    line = line.strip()
-                    
-                    if line.startswith('#EXTINF'):
-                        current_name = line.split(',')[-1].strip() if ',' in line else ""
-                        
-                    elif line and not line.startswith('#') and (line.startswith('http') or line.startswith('rtmp')):
-                        # Check if line matches any search term
-                        matches_search = False
-                        if not channel_name:
-                            matches_search = True
-                        else:
-                            combined_text = (current_name + ' ' + line).lower()
-                            for term in search_terms:
-                                if term in combined_text:
-                                    matches_search = True
-                                    break
-                        
-                        if matches_search:
-                            links_to_test.append({
-                                'url': line,
-                                'title': current_name if current_name else 'Stream'
-                            })
-                            source_matches += 1
-                        
-                        current_name = ""
-                
-                print(colored(f"✓ {source_matches} found", "green"))
-            
-            except KeyboardInterrupt:
-                print(colored("\n[!] Interrupted during collection", "yellow"))
-                raise
-            except Exception as e:
-                print(colored("✗ Error", "red"))
-        
-        # Check if interrupted before testing
-        if self.shutdown_flag.is_set():
-            print(colored("\n[!] Operation interrupted. Exiting...", "yellow"))
-            return 0
-            
-        print(colored(f"\n[✓] Collected {len(links_to_test)} potential links", "green"))
-        
-        if not links_to_test:
-            print(colored(f"\n[!] No matching links found. Try different search terms.", "red"))
-            return 0
-        
-        # Phase 2: Test links with multi-threading
-        print(colored(f"\n[Phase 2/2] Testing links with 5 concurrent threads...\n", "yellow"))
+                with self.lock:
+                    links_collected[0] += 1
+                return True
+            return False
         
         def test_link_wrapper(link_data):
             """Wrapper for thread-safe link testing"""
             # Check if shutdown requested
-            if self.shutdown_flag.is_set():
+            if should_stop():
                 return False
-                
+            
+            url = link_data['url']
+            details = {}
+            if link_data.get('screened'):
+                ok = self._check_link(url, details=details)
+            elif self.two_pass:
+                ok = self._precheck_link(url, details)
+                if ok is None:
+                    if self._screen_link(url):
+                        # Passed the quick pass: back in line, ahead of unprobed links
+                        link_queue.requeue(screened(link_data))
+                        return False
+                    ok = False
+            else:
+                ok = self.test_iptv_link(url, details=details)
+            if should_stop():
+                return False  # Stopped while the probe ran
+            return record_result(link_data, ok, details)
+        
+        def record_result(link_data, ok, details=None):
+            """Count and report a tested link, stopping once the target is reached.
+            
+            details (renditions found by the probe) is kept on the saved link.
+            """
             url = link_data['url']
             title = link_data['title']
+            scorer.record(link_data.get('source'), ok)
             
-            with self.lock:
-                current_count = self.total_tested
-                
-            if self.test_iptv_link(url):
+            current_count = self.total_tested
+            
+            if ok:
                 with self.lock:
+                    if self.total_working >= num_links:
+                        return False
                     self.total_working += 1
                     working_count = self.total_working
-                    self.scraped_links.append({'title': title, 'url': url})
+                    result = {'title': title, 'url': url}
+                    result.update(details or {})
+                    self.scraped_links.append(result)
+                    if working_count >= num_links:
+                        stop_event.set()
                 
                 print(colored(f"[✓ {working_count}/{num_links}] {title[:50]}", "green"))
                 return True
@@ -1460,30 +1645,113 @@ class IPTVScraper:
                 print(colored(f"[✗ {current_count}] {title[:50]}", "red"))
                 return False
         
-        # Use ThreadPoolExecutor for parallel testing (25 workers for maximum speed)
+        def link_worker():
+            """Pull links off the queue until collection is over or we can stop"""
+            while not should_stop():
+                try:
+                    link_data = link_queue.get(timeout=0.2)
+                except queue.Empty:
+                    if collection_done.is_set() and link_queue.empty():
+                        break
+                    continue
+                try:
+                    test_link_wrapper(link_data)
+                finally:
+                    link_queue.done(link_data)
+        
+        if self.engine == 'async':
+            tester = AsyncLinkTester(self, concurrency=self.async_concurrency)
+            testers = f"up to {self.async_concurrency} async probes"
+        else:
+            testers = f"{self.link_workers} workers"
+        if self.host_limit:
+            testers += f" (at most {self.host_limit} per host)"
+        if self.two_pass:
+            testers += f", quick pass first then {self.validation} validation of the survivors"
+        elif self.validation != 'standard':
+            testers += f", {self.validation} validation"
+        print(colored(f"\n[Phase 1+2] Collecting links from {total_sources} sources and testing them with {testers} as they arrive...\n", "yellow"))
+        
+        source_executor = ThreadPoolExecutor(max_workers=self.source_workers)
+        link_executor = ThreadPoolExecutor(max_workers=1 if self.engine == 'async' else self.link_workers)
         try:
-            with ThreadPoolExecutor(max_workers=25) as executor:
-                futures = {executor.submit(test_link_wrapper, link): link for link in links_to_test}
-                
-                for future in as_completed(futures):
-                    # Check for shutdown flag
+            if self.engine == 'async':
+                # One thread runs the event loop and drains the same queue
+                link_executor.submit(tester.drain, link_queue, collection_done, should_stop, record_result)
+            else:
+                for _ in range(self.link_workers):
+                    link_executor.submit(link_worker)
+            
+            futures = {
+                source_executor.submit(
+                    self.collect_source, source_url, matcher,
+                    lambda link_data, source_url=source_url: enqueue_link(dict(link_data, source=source_url))
+                ): source_url
+                for source_url in m3u_sources
+            }
+            
+            # Poll rather than block on the next source, so a stop is noticed
+            # while long downloads are still running
+            pending = set(futures)
+            idx = 0
+            while pending:
+                done, pending = wait(pending, timeout=0.2, return_when=FIRST_COMPLETED)
+                if should_stop():
+                    for f in pending:
+                        f.cancel()
                     if self.shutdown_flag.is_set():
-                        # Cancel all remaining futures
-                        for f in futures:
-                            f.cancel()
-                        print(colored("\n[!] Stopping due to user interrupt...", "yellow"))
-                        break
-                        
-                    with self.lock:
-                        if self.total_working >= num_links:
-                            # Cancel remaining futures
-                            for f in futures:
-                                f.cancel()
-                            break
-        except KeyboardInterrupt:
+                        print(colored("\n[!] Stopping collection due to user interrupt...", "yellow"))
+                    break
+                
+                for future in done:
+                    idx += 1
+                    source_url = futures[future]
+                    source_name = source_url.split('/')[-2] if '/' in source_url else source_url[:30]
+                    progress = colored(f"[{idx}/{total_sources}] ", "cyan") + colored(f"{source_name}...", "white")
+                    
+                    try:
+                        source_matches = future.result()
+                    except Exception:
+                        print(progress, colored("✗ Error", "red"))
+                        continue
+                    
+                    if source_matches is None:
+                        print(progress, colored("✗ Failed", "red"))
+                    else:
+                        print(progress, colored(f"✓ {source_matches} found", "green"))
+        
+        except BaseException:
+            # KeyboardInterrupt or SystemExit from the signal handler
             self.shutdown_flag.set()
             print(colored("\n[!] Interrupted by user. Cleaning up...", "yellow"))
             raise
+        finally:
+            collection_done.set()
+            source_executor.shutdown(wait=True)
+            link_executor.shutdown(wait=True)
+            stop_event.clear()
+            if self.compact_dedup:
+                # Quick-pass survivors left in the queue are claimed but were never checked
+                for link_data in link_queue.pending():
+                    if link_data.get('screened'):
+                        self.checked_urls.discard(link_data['url'])
+                self.checked_urls.flush()
+            if self.result_cache is not None:
+                self.result_cache.flush()
+                try:
+                    save_domain_stats(self.domain_stats)
+                except OSError:
+                    pass
+        
+        if self.shutdown_flag.is_set():
+            print(colored("\n[!] Operation interrupted. Exiting...", "yellow"))
+            return self.total_working
+        
+        print(colored(f"\n[✓] Collected {links_collected[0]} potential links", "green"))
+        
+        if not links_collected[0]:
+            print(colored(f"\n[!] No matching links found. Try different search terms.", "red"))
+            return 0
         
         # If not enough found, try advanced scraping methods
         if self.total_working < num_links and not nsfw_mode:
@@ -1608,6 +1876,21 @@ class IPTVScraper:
         else:
             print(colored(f"[✓] SUCCESS! Found {self.total_working} working link(s)!", "green"))
             print(colored(f"[*] Tested {self.total_tested} URLs total", "cyan"))
+        if self.cached_results[True] or self.cached_results[False]:
+            print(colored(f"[*] Reused {self.cached_results[True]} working and skipped {self.cached_results[False]} dead URL(s) from previous runs", "cyan"))
+        breaker_skips = self.breaker.skip_counts()
+        if breaker_skips:
+            skipped = sum(count for _, count in breaker_skips)
+            hosts = ', '.join(f"{domain} ({count})" for domain, count in breaker_skips[:3])
+            more = f" +{len(breaker_skips) - 3} more" if len(breaker_skips) > 3 else ""
+            print(colored(f"[*] Circuit breaker skipped {skipped} URL(s) on {len(breaker_skips)} unresponsive host(s): {hosts}{more}", "yellow"))
+        if self.dns_skipped:
+            print(colored(f"[*] Skipped {len(self.dns_skipped)} URL(s) on host names that do not resolve", "yellow"))
+        if self.compact_dedup:
+            dedup = self.checked_urls
+            print(colored(f"[*] Compact dedup: {len(dedup)} URL(s) seen, {len(dedup.filter.bits) / 1e6:.1f} MB filter, {dedup.false_positives} false positive(s) settled on disk", "cyan"))
+        if self.playlist_cache.hits or self.playlist_cache.coalesced:
+            print(colored(f"[*] Nested playlists: {self.playlist_cache.hits} served from cache, {self.playlist_cache.coalesced} shared with a fetch in flight", "cyan"))
         print(colored(f"{'='*60}\n", "cyan"))
         
         return self.total_working
@@ -1634,11 +1917,13 @@ class IPTVScraper:
         
         print(colored("[*] Creating m3u file..........", "yellow"))
         
+        links = rank_links(self.scraped_links, self.top_per_channel) if self.rank else self.scraped_links
+        
         try:
             with open(filepath, "w", encoding="utf-8") as m3u_file:
                 m3u_file.write("#EXTM3U\n\n")
                 
-                for link_data in self.scraped_links:
+                for link_data in links:
                     if isinstance(link_data, dict):
                         title = link_data.get('title', 'Stream')
                         url = link_data.get('url', '')
@@ -1649,12 +1934,71 @@ class IPTVScraper:
                         m3u_file.write(f"{link_data}\n")
             
             print(colored(f"[✓] Created m3u file: {filepath}", "green"))
-            print(colored(f"[✓] Total links saved: {len(self.scraped_links)}", "green"))
+            print(colored(f"[✓] Total links saved: {len(links)}", "green"))
             
         except Exception as e:
             print(colored(f"[!] Error creating m3u file: {str(e)}", "red"))
 
 
+def build_scraper(args):
+    """Create an IPTVScraper configured from the command-line arguments"""
+    return IPTVScraper(
+        source_workers=args.source_workers,
+        source_host_limit=args.source_host_limit,
+        use_cache=not args.no_cache,
+        cache_max_age=args.cache_max_age,
+        engine=args.engine,
+        async_concurrency=args.async_concurrency,
+        ok_ttl=args.ok_ttl,
+        failed_ttl=args.failed_ttl,
+        breaker_threshold=args.breaker_threshold,
+        breaker_cooldown=args.breaker_cooldown,
+        link_workers=args.link_workers,
+        host_limit=args.host_limit,
+        host_rate=args.host_rate,
+        dns_cache=not args.no_dns_cache,
+        validation=args.validate,
+        two_pass=args.two_pass,
+        compact_dedup=args.compact_dedup,
+        dedup_error_rate=args.dedup_error_rate,
+        dedup_file=os.path.expanduser(args.dedup_file) if args.dedup_file else None,
+        rank=args.rank,
+        top_per_channel=args.top_per_channel,
+    )
+
+
+def search_catalog(query, limit=None):
+    """Search the local channel catalog without touching the network"""
+    try:
+        catalog = ChannelCatalog()
+    except (OSError, sqlite3.Error) as e:
+        print(colored(f"[!] Could not open channel catalog: {e}", "red"))
+        return 1
+    
+    source_count, entry_count = catalog.stats()
+    if not source_count:
+        print(colored("[!] The channel catalog is empty. Run a normal search first to build it.", "red"))
+        return 1
+    
+    matcher = TermMatcher(expand_search_terms(query)) if query else None
+    print(colored(f"[*] Searching {entry_count} catalog entries from {source_count} sources for: {query or 'all channels'}", "cyan"))
+    
+    found = 0
+    seen = set()
+    for entry in catalog.search(matcher):
+        if entry.url in seen:
+            continue
+        seen.add(entry.url)
+        found += 1
+        print(colored(f"  {entry.title or 'Stream'}", "green") + colored(f"  {entry.url}", "white"))
+        if limit and found >= limit:
+            break
+    
+    print(colored(f"\n[✓] {found} matching entries (untested)", "green" if found else "red"))
+    catalog.close()
+    return 0
+
+
 def update_cli():
     """Update the IPTV scraper CLI to the latest version"""
     art = text2art("IPTV Updater")
@@ -1821,6 +2165,155 @@ def main():
         help='Search for live sports match streams (soccer, basketball, etc.)'
     )
     
+    parser.add_argument(
+        '--source-workers',
+        type=int,
+        default=16,
+        help='Number of M3U sources to download in parallel (default: 16)'
+    )
+    
+    parser.add_argument(
+        '--source-host-limit',
+        type=int,
+        default=8,
+        help='Maximum parallel source downloads per host (default: 8)'
+    )
+    
+    parser.add_argument(
+        '--link-workers',
+        type=int,
+        default=25,
+        help='Link testing threads for the thread engine (default: 25)'
+    )
+    
+    parser.add_argument(
+        '--host-limit',
+        type=int,
+        default=8,
+        help='Maximum links tested at once on one host, 0 for no limit (default: 8)'
+    )
+    
+    parser.add_argument(
+        '--host-rate',
+        type=float,
+        default=10,
+        help='Maximum link tests started per second on one host, 0 for no limit (default: 10)'
+    )
+    
+    parser.add_argument(
+        '--no-dns-cache',
+        action='store_true',
+        help='Resolve host names through the system resolver on every request'
+    )
+    
+    parser.add_argument(
+        '--validate',
+        choices=list(validate.LEVELS),
+        default='standard',
+        help='How thoroughly links are checked: quick (status and playlist header), standard (also a segment) or deep (also a playlist reload to see a live stream advance) (default: standard)'
+    )
+    
+    parser.add_argument(
+        '--two-pass',
+        action='store_true',
+        help='Quick-probe every candidate first and check only the survivors at the --validate level'
+    )
+    
+    parser.add_argument(
+        '--compact-dedup',
+        action='store_true',
+        help='Track seen URLs in a Bloom filter backed by an exact check on disk, so memory stays at a few MB on very large runs'
+    )
+    
+    parser.add_argument(
+        '--dedup-error-rate',
+        type=float,
+        default=0.001,
+        help='False-positive rate of the --compact-dedup filter; a false positive only costs a disk lookup (default: 0.001)'
+    )
+    
+    parser.add_argument(
+        '--dedup-file',
+        help='Keep the --compact-dedup state in this file so URLs that failed in earlier runs are skipped for --failed-ttl seconds (implies --compact-dedup)'
+    )
+    
+    parser.add_argument(
+        '--rank',
+        action='store_true',
+        help='Measure the throughput of every working link and save the playlist fastest mirrors first, grouped by channel'
+    )
+    
+    parser.add_argument(
+        '--top-per-channel',
+        type=int,
+        default=0,
+        metavar='N',
+        help='Save only the N fastest mirrors of each channel (implies --rank)'
+    )
+    
+    parser.add_argument(
+        '--cache-max-age',
+        type=int,
+        default=0,
+        help='Reuse cached M3U sources younger than this many seconds without revalidating (default: 0)'
+    )
+    
+    parser.add_argument(
+        '--no-cache',
+        action='store_true',
+        help='Disable the on-disk caches (sources, catalog, GitHub repos and test results)'
+    )
+    
+    parser.add_argument(
+        '--ok-ttl',
+        type=int,
+        default=1800,
+        help='Trust a link that worked in a previous run for this many seconds (default: 1800)'
+    )
+    
+    parser.add_argument(
+        '--failed-ttl',
+        type=int,
+        default=6 * 3600,
+        help='Skip a link that failed in a previous run for this many seconds (default: 21600)'
+    )
+    
+    parser.add_argument(
+        '--breaker-threshold',
+        type=int,
+        default=5,
+        help='Skip a host after this many consecutive timeouts/connection errors, 0 to disable (default: 5)'
+    )
+    
+    parser.add_argument(
+        '--breaker-cooldown',
+        type=int,
+        default=60,
+        help='Seconds before a skipped host gets one retry (default: 60)'
+    )
+    
+    parser.add_argument(
+        '--engine',
+        choices=['thread', 'async'],
+        default='thread',
+        help='Link testing engine: 25 worker threads, or asyncio with many probes in flight (needs aiohttp)'
+    )
+    
+    parser.add_argument(
+        '--async-concurrency',
+        type=int,
+        default=500,
+        help='Maximum links tested at once by the async engine (default: 500)'
+    )
+    
+    parser.add_argument(
+        '--search-catalog',
+        type=str,
+        metavar='QUERY',
+        default=None,
+        help='Search the local channel catalog offline (built by previous searches)'
+    )
+    
     parser.add_argument(
         '--popular-channels',
         action='store_true',
@@ -1867,6 +2360,14 @@ def main():
     if args.update:
         return update_cli()
     
+    # Handle offline catalog search
+    if args.search_catalog is not None:
+        return search_catalog(args.search_catalog, args.number)
+    
+    if args.engine == 'async' and aiohttp is None:
+        print(colored('[!] The async engine needs aiohttp. Install it with: pip install "iptv-scraper[async]"', "red"))
+        return 1
+    
     # Show banner
     art = text2art("IPTV  SCRAPER", font="block")
     print(colored(art, "cyan"))
@@ -1898,7 +2399,7 @@ def main():
                 print(f"Number of streams: {num_links}")
             
             # Create scraper and directly scrape match sites
-            scraper = IPTVScraper()
+            scraper = build_scraper(args)
             scraper_instance = scraper  # Store for signal handler
             current_channel = channel_name  # Store channel name
             print(colored(f"\n{'='*60}", "green"))
@@ -1949,7 +2450,7 @@ def main():
         
         # Create scraper and run (skip if already done in live-match mode)
         if not args.live_match:
-            scraper = IPTVScraper()
+            scraper = build_scraper(args)
             scraper_instance = scraper  # Store for signal handler
             current_channel = channel_name  # Store channel name
             found = scraper.scrape_links(channel_name, num_links, nsfw_mode=args.nsfw)
@@ -0,0 +1,218 @@
+"""
+Stream URL extraction from web pages and paste sites.
+
+HTML is handled through HTMLPage, which parses a page at most once and uses
+lxml when it is installed (``pip install iptv-scraper[fast]``), falling back
+to a streaming ``html.parser`` tokenizer that never builds a tree.
+"""
+
+import re
+from html.parser import HTMLParser
+
+from bs4 import BeautifulSoup
+
+try:
+    import lxml.html
+    from lxml import etree
+except ImportError:
+    lxml = None
+
+# Tree builder used when a caller needs a full BeautifulSoup tree
+SOUP_FEATURES = 'lxml' if lxml is not None else 'html.parser'
+
+
+# Characters allowed inside a scraped URL
+_URL_CHAR = r'[^\s<>"{}|\\^\[\]`]'
+
+# (pattern, literals) pairs. Every pattern starts with https?:// and only
+# consumes URL characters, so a match always lies inside the run of URL
+# characters that starts at an "http" occurrence. The literals are cheap
+# pre-checks: a pattern can only match a lowercased run containing one of them.
+STREAM_URL_PATTERNS = [
+    # Standard streaming URLs (m3u8, ts, mpd, etc.)
+    (r'https?://[^\s<>"{}|\\^\[\]`]+\.(?:m3u8?|ts|mpd|mpegurl|stream|aac|mp3|mp4|flv)',
+     ('.m3u', '.ts', '.mpd', '.mpegurl', '.stream', '.aac', '.mp3', '.mp4', '.flv')),
+    # IP-based streaming (common IPTV ports)
+    (r'https?://(?:\d{1,3}\.){3}\d{1,3}(?::\d+)?/[^\s<>"{}|\\^\[\]`]*',
+     ('://0', '://1', '://2', '://3', '://4', '://5', '://6', '://7', '://8', '://9')),
+    # HLS/DASH patterns
+    (r'https?://[^\s<>"{}|\\^\[\]`]+/(?:hls|dash|live|stream|channel|tv|playlist)/[^\s<>"{}|\\^\[\]`]+',
+     ('/hls/', '/dash/', '/live/', '/stream/', '/channel/', '/tv/', '/playlist/')),
+    # M3U8 with query parameters
+    (r'https?://[^\s<>"{}|\\^\[\]`]+\.m3u8\?[^\s<>"{}|\\^\[\]`]*',
+     ('.m3u8?',)),
+    # TS streams with path patterns (like iptv.am000.tv)
+    (r'https?://[^\s<>"{}|\\^\[\]`]+/live/[^\s<>"{}|\\^\[\]`]+/[^\s<>"{}|\\^\[\]`]+/\d+\.ts',
+     ('/live/',)),
+    # CDN patterns (CloudFront, Akamai, etc.)
+    (r'https?://[^\s<>"{}|\\^\[\]`]*\.(?:cloudfront\.net|akamaihd\.net|cdn\d*\.|edge\d*\.|stream\d*\.)[^\s<>"{}|\\^\[\]`]+',
+     ('.cloudfront.net', '.akamaihd.net', '.cdn', '.edge', '.stream')),
+    # Sports streaming specific (BeIN, DAZN, ESPN, etc.)
+    (r'https?://[^\s<>"{}|\\^\[\]`]*(?:bein|dazn|espn|sky|sport)[^\s<>"{}|\\^\[\]`]*\.(?:m3u8?|ts)[^\s<>"{}|\\^\[\]`]*',
+     ('bein', 'dazn', 'espn', 'sky', 'sport')),
+    # Encoded URLs (URL in query params)
+    (r'https?://[^\s<>"{}|\\^\[\]`]*[?&](?:url|src|stream|link)=https?[^\s<>"{}|\\^\[\]`]+',
+     ('url=http', 'src=http', 'stream=http', 'link=http')),
+    # Albaplayer and similar player URLs
+    (r'https?://[^\s<>"{}|\\^\[\]`]*(?:albaplayer|player|embed)/[^\s<>"{}|\\^\[\]`]+',
+     ('player/', 'embed/')),
+    # Alkoora and yalllashoot domains
+    (r'https?://[^\s<>"{}|\\^\[\]`]*\.(?:alkoora\.live|yalllashoot\.today)[^\s<>"{}|\\^\[\]`]*',
+     ('.alkoora.live', '.yalllashoot.today')),
+    # IPTV server patterns (common IPTV hosting)
+    (r'https?://[^\s<>"{}|\\^\[\]`]*\.(?:tv|live|stream):\d+/[^\s<>"{}|\\^\[\]`]+',
+     ('.tv:', '.live:', '.stream:')),
+]
+
+_COMPILED_PATTERNS = [
+    (re.compile(pattern, re.IGNORECASE), literals)
+    for pattern, literals in STREAM_URL_PATTERNS
+]
+
+# Any literal of any pattern: runs without one cannot match at all
+_ANY_LITERAL_RE = re.compile('|'.join(
+    re.escape(literal)
+    for _, literals in STREAM_URL_PATTERNS
+    for literal in literals
+))
+
+_URL_START_RE = re.compile(r'https?://', re.IGNORECASE)
+_URL_RUN_RE = re.compile(r'https?://' + _URL_CHAR + r'*', re.IGNORECASE)
+
+
+def find_stream_urls(text):
+    """Find every stream-looking URL in text in a single pass.
+
+    Gives the same set of URLs as running ``re.findall`` with each of
+    STREAM_URL_PATTERNS, but the text is scanned once for "http://" and
+    "https://" anchors and each pattern is only tried at those anchors.
+    """
+    found = set()
+    # Per pattern: offset where its previous match ended, mirroring findall
+    resume_at = [0] * len(_COMPILED_PATTERNS)
+
+    # Anchors nested in a run (e.g. "?url=http://...") are visited too
+    for anchor in _URL_START_RE.finditer(text):
+        start = anchor.start()
+        run_lower = _URL_RUN_RE.match(text, start).group().lower()
+        if not _ANY_LITERAL_RE.search(run_lower):
+            continue
+
+        for idx, (pattern, literals) in enumerate(_COMPILED_PATTERNS):
+            if start < resume_at[idx]:
+                continue
+            if not any(literal in run_lower for literal in literals):
+                continue
+            match = pattern.match(text, start)
+            if match:
+                found.add(match.group())
+                resume_at[idx] = match.end()
+
+    return [url for url in found if url.startswith('http') and len(url) > 15]
+
+
+def _embedded_url(tag, attributes, in_video):
+    """Get the stream URL carried by a tag, if it has one"""
+    if tag == 'iframe':
+        src = attributes.get('src') or attributes.get('data-src')
+        if src:
+            if src.startswith('//'):
+                return 'iframe', 'https:' + src
+            if not src.startswith('/'):  # Relative URLs need base URL
+                return 'iframe', src
+    elif tag == 'embed' or (tag == 'source' and in_video):
+        src = attributes.get('src')
+        if src and src.startswith('http'):
+            return tag, src
+    return None
+
+
+class _EmbedTokenizer(HTMLParser):
+    """Collect embedded stream URLs from start tags without building a tree"""
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.found = {'iframe': [], 'embed': [], 'source': [], 'data-stream': [], 'data-url': []}
+        self.video_depth = 0
+
+    def handle_starttag(self, tag, attrs):
+        attributes = {name: value or '' for name, value in attrs}
+        self._collect(tag, attributes)
+        if tag == 'video':
+            self.video_depth += 1
+
+    def handle_startendtag(self, tag, attrs):
+        self._collect(tag, {name: value or '' for name, value in attrs})
+
+    def handle_endtag(self, tag):
+        if tag == 'video' and self.video_depth:
+            self.video_depth -= 1
+
+    def _collect(self, tag, attributes):
+        hit = _embedded_url(tag, attributes, self.video_depth > 0)
+        if hit:
+            self.found[hit[0]].append(hit[1])
+        for name in ('data-stream', 'data-url'):
+            if name in attributes:
+                self.found[name].append(attributes[name])
+
+
+def _embedded_urls_lxml(html_content):
+    found = {'iframe': [], 'embed': [], 'source': [], 'data-stream': [], 'data-url': []}
+    try:
+        parser = lxml.html.HTMLParser(encoding='utf-8')
+        root = lxml.html.document_fromstring(html_content.encode('utf-8'), parser=parser)
+    except (etree.ParserError, ValueError):
+        return found
+
+    for element in root.iter(etree.Element):
+        tag = element.tag
+        attributes = element.attrib
+        in_video = tag == 'source' and next(element.iterancestors('video'), None) is not None
+        hit = _embedded_url(tag, attributes, in_video)
+        if hit:
+            found[hit[0]].append(hit[1])
+        for name in ('data-stream', 'data-url'):
+            if name in attributes:
+                found[name].append(attributes[name])
+    return found
+
+
+class HTMLPage:
+    """A fetched web page, parsed at most once however many extractors run.
+
+    ``stream_urls`` scans the raw text, ``embedded_urls`` comes from iframe,
+    embed, video source and data-stream/data-url attributes, and ``soup`` is a
+    BeautifulSoup tree for site-specific lookups. Each is computed on first
+    use and kept.
+    """
+    def __init__(self, text):
+        self.text = text
+        self._stream_urls = None
+        self._embedded_urls = None
+        self._soup = None
+
+    @property
+    def stream_urls(self):
+        if self._stream_urls is None:
+            self._stream_urls = find_stream_urls(self.text)
+        return self._stream_urls
+
+    @property
+    def embedded_urls(self):
+        if self._embedded_urls is None:
+            if lxml is not None:
+                found = _embedded_urls_lxml(self.text)
+            else:
+                tokenizer = _EmbedTokenizer()
+                tokenizer.feed(self.text)
+                tokenizer.close()
+                found = tokenizer.found
+            self._embedded_urls = (found['iframe'] + found['embed'] + found['source']
+                                   + found['data-stream'] + found['data-url'])
+        return self._embedded_urls
+
+    @property
+    def soup(self):
+        if self._soup is None:
+            self._soup = BeautifulSoup(self.text, SOUP_FEATURES)
+        return self._soup
@@ -0,0 +1,88 @@
+"""
+Incremental reader for large JSON array documents.
+
+``iter_json_array()`` yields the items of a top-level JSON array while the
+document is still downloading, holding only the undecoded tail in memory.
+"""
+
+import codecs
+import json
+import re
+
+
+_WHITESPACE = re.compile(r'[ \t\n\r]*')
+_SEPARATOR = re.compile(r'[ \t\n\r,]*')
+
+
+def iter_json_array(chunks):
+    """Yield the items of a JSON array from an iterable of text or byte chunks.
+
+    Documents that are an object rather than an array are read whole and
+    their "items" list is yielded instead. Raises ValueError on malformed
+    JSON.
+    """
+    decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+    json_decoder = json.JSONDecoder()
+    chunks = iter(chunks)
+    buffer = ''
+    pos = 0
+    exhausted = False
+
+    def read_more():
+        nonlocal buffer, pos, exhausted
+        for chunk in chunks:
+            if isinstance(chunk, bytes):
+                chunk = decoder.decode(chunk)
+            if chunk:
+                buffer = buffer[pos:] + chunk
+                pos = 0
+                return True
+        buffer = buffer[pos:] + decoder.decode(b'', final=True)
+        pos = 0
+        exhausted = True
+        return False
+
+    # Find the opening bracket
+    while True:
+        pos = _WHITESPACE.match(buffer, pos).end()
+        if pos < len(buffer) or not read_more():
+            break
+    if pos >= len(buffer):
+        return
+    if buffer[pos] != '[':
+        while read_more():
+            pass
+        document = json.loads(buffer)
+        items = document.get('items', []) if isinstance(document, dict) else []
+        for item in items:
+            yield item
+        return
+    pos += 1
+
+    while True:
+        pos = _SEPARATOR.match(buffer, pos).end()
+        if pos >= len(buffer):
+            if exhausted:
+                raise ValueError('Unterminated JSON array')
+            read_more()
+            continue
+        if buffer[pos] == ']':
+            return
+
+        try:
+            item, end = json_decoder.raw_decode(buffer, pos)
+            after = _WHITESPACE.match(buffer, end).end()
+        except ValueError:
+            item, after = None, None
+
+        # A value is only complete once the separator after it has arrived:
+        # "-3500." decodes as -3500 while the rest of the number is still
+        # on the wire
+        if after is None or after >= len(buffer) or buffer[after] not in ',]':
+            if exhausted:
+                raise ValueError('Malformed JSON array item at offset %d' % pos)
+            read_more()
+            continue
+
+        yield item
+        pos = after
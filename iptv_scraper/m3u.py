@@ -0,0 +1,211 @@
+"""
+Incremental M3U playlist parser.
+
+Works line by line over any iterable (a file, ``response.iter_lines()``,
+a list), so the whole playlist never has to be held in memory.
+``parse_m3u_blocks()`` does the same over large text blocks and can skip
+everything but the entries a TermMatcher hits.
+"""
+
+import bisect
+import codecs
+import re
+from collections import namedtuple
+
+
+M3UEntry = namedtuple('M3UEntry', ['title', 'url', 'attributes'])
+
+# key="value" pairs in an #EXTINF line (tvg-id, tvg-name, group-title, ...)
+_ATTRIBUTE_RE = re.compile(r'(?<![\w-])([\w-]+)="([^"]*)"')
+
+# #EXTINF:<duration and attributes>,<title>
+_EXTINF_RE = re.compile(r'#EXTINF:?([^",]*(?:"[^"]*"[^",]*)*),(.*)')
+
+
+def parse_extinf(line):
+    """Split an #EXTINF line into its title and attribute dict"""
+    # The title starts at the first comma that is not inside a quoted value
+    match = _EXTINF_RE.match(line)
+    if match is None:
+        # Unbalanced quotes: fall back to the first comma
+        return (line.split(',', 1)[1].strip() if ',' in line else ''), {}
+
+    body, title = match.groups()
+    attributes = {}
+    if '="' in body:
+        for key, value in _ATTRIBUTE_RE.findall(body):
+            attributes[key.lower()] = value
+
+    return title.strip(), attributes
+
+
+def _extinf_title(line):
+    """Title of an #EXTINF line, without parsing its attributes"""
+    match = _EXTINF_RE.match(line)
+    if match is None:
+        return line.split(',', 1)[1].strip() if ',' in line else ''
+    return match.group(2).strip()
+
+
+def parse_m3u(lines, with_attributes=True):
+    """Yield an M3UEntry for every stream URL in an M3U playlist.
+
+    ``lines`` may yield str or bytes (bytes are decoded as UTF-8). Comment and
+    directive lines other than #EXTINF are skipped; the title and attributes
+    of an #EXTINF line apply to the next URL only. Without with_attributes
+    every entry gets an empty attribute dict, which saves most of the
+    parsing when only titles and URLs are needed.
+    """
+    title = ''
+    attributes = {}
+
+    for line in lines:
+        if isinstance(line, bytes):
+            line = line.decode('utf-8', errors='replace')
+        line = line.strip()
+
+        if not line:
+            continue
+
+        if line.startswith('#'):
+            if line.startswith('#EXTINF'):
+                if with_attributes:
+                    title, attributes = parse_extinf(line)
+                else:
+                    title = _extinf_title(line)
+            continue
+
+        yield M3UEntry(title, line, attributes)
+        title = ''
+        attributes = {}
+
+
+def _complete_entries_end(text):
+    """Offset just past the last stream URL line in text, or 0 if there is none"""
+    end = text.rfind('\n')
+    while end >= 0:
+        start = text.rfind('\n', 0, end) + 1
+        line = text[start:end].strip()
+        if line and not line.startswith('#'):
+            return end + 1
+        if start == 0:
+            break
+        end = start - 1
+    return 0
+
+
+def iter_entry_blocks(chunks):
+    """Regroup raw text or byte chunks into blocks of complete entries.
+
+    Every block ends right after a stream URL line, so an #EXTINF line never
+    ends up in a different block from its URL.
+    """
+    decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+    carry = ''
+
+    for chunk in chunks:
+        if isinstance(chunk, bytes):
+            chunk = decoder.decode(chunk)
+        text = carry + chunk
+        cut = _complete_entries_end(text)
+        if cut:
+            yield text[:cut]
+            carry = text[cut:]
+        else:
+            carry = text
+
+    carry += decoder.decode(b'', final=True)
+    if carry:
+        yield carry
+
+
+def _entry_at(block, url_start, url_end, with_attributes=True):
+    """Build the entry for the URL line at block[url_start:url_end]"""
+    title = ''
+    attributes = {}
+
+    # Walk back to the previous URL line; the nearest #EXTINF belongs to us
+    end = url_start - 1
+    while end > 0:
+        start = block.rfind('\n', 0, end) + 1
+        line = block[start:end].strip()
+        if line.startswith('#EXTINF'):
+            if with_attributes:
+                title, attributes = parse_extinf(line)
+            else:
+                title = _extinf_title(line)
+            break
+        if line and not line.startswith('#'):
+            break
+        end = start - 1
+
+    return M3UEntry(title, block[url_start:url_end].strip(), attributes)
+
+
+def _matching_entries(block, matcher, with_attributes=True):
+    lowered = block.lower()
+    if len(lowered) != len(block):
+        # Some characters change length when lowercased, offsets would drift
+        for entry in parse_m3u(block.split('\n'), with_attributes):
+            if matcher.matches(entry.title + ' ' + entry.url):
+                yield entry
+        return
+
+    find = lowered.find
+    size = len(block)
+    hits = matcher.hits(lowered)
+    i = 0
+    while i < len(hits):
+        hit = hits[i]
+
+        # Walk from the line holding the hit to the URL line of its entry,
+        # keeping the last #EXTINF line on the way
+        line_start = lowered.rfind('\n', 0, hit) + 1
+        extinf = None
+        while True:
+            line_end = find('\n', line_start)
+            if line_end == -1:
+                line_end = size
+            line = block[line_start:line_end].strip()
+            if line and line[0] != '#':
+                break
+            if line.startswith('#EXTINF'):
+                extinf, extinf_start, extinf_end = line, line_start, line_end
+            if line_end == size:
+                return
+            line_start = line_end + 1
+        # Every other hit up to the end of this entry is settled with it
+        i = bisect.bisect_right(hits, line_end, i + 1)
+
+        if extinf is None:
+            # The hit is in the URL line (or a directive after the #EXTINF)
+            entry = _entry_at(block, line_start, line_end, with_attributes)
+            in_title = False
+        else:
+            if with_attributes:
+                title, attributes = parse_extinf(extinf)
+            else:
+                title, attributes = _extinf_title(extinf), {}
+            entry = M3UEntry(title, line, attributes)
+            # The title is what ends the #EXTINF line
+            in_title = bool(title) and block.rfind(title, extinf_start, extinf_end) <= hit < extinf_end
+        # A hit in the title or the URL is a match; one elsewhere in the
+        # #EXTINF line may be in an attribute, so the matcher decides
+        if hit >= line_start or in_title or matcher.matches(entry.title + ' ' + entry.url):
+            yield entry
+
+
+def parse_m3u_blocks(blocks, matcher=None, with_attributes=True):
+    """Yield M3UEntry records from blocks made by iter_entry_blocks().
+
+    With a matcher, only entries whose title or URL contain one of its terms
+    are yielded, and only the lines around the matcher's hits are parsed.
+    with_attributes is as for parse_m3u().
+    """
+    for block in blocks:
+        if matcher is None or matcher.match_all:
+            for entry in parse_m3u(block.split('\n'), with_attributes):
+                yield entry
+        else:
+            for entry in _matching_entries(block, matcher, with_attributes):
+                yield entry
@@ -0,0 +1,98 @@
+"""
+Short-lived in-memory cache of nested playlists for link testing.
+
+Many candidates lead to the same media playlist: the numbered channel pages
+of one site, or the same CDN path reached through masters with different
+tokens. ``PlaylistCache`` keeps the fetched body for a few seconds, which is
+well within the life of a live playlist, and coalesces fetches: while one
+tester is downloading a playlist, the others asking for it wait for that
+download instead of sending their own request.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+
+class PlaylistCache:
+    """Recently fetched playlists by URL, each fetched at most once at a time.
+
+    Entries are (status code, text) pairs; at most max_entries are kept,
+    each for ttl seconds, error statuses included. A fetch that raises is
+    handed to the callers waiting for it but is not cached.
+    """
+    def __init__(self, ttl=5, max_entries=2048):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()  # url -> (expires, (status, text)), oldest first
+        self.pending = {}  # url -> [Event set when the fetch finishes, result or exception]
+        self.hits = 0
+        self.coalesced = 0
+
+    def get(self, url):
+        """Get the cached (status, text) for url, or None"""
+        with self.lock:
+            return self._lookup(url)
+
+    def _lookup(self, url):
+        entry = self.entries.get(url)
+        if entry is None:
+            return None
+        if entry[0] <= time.time():
+            del self.entries[url]
+            return None
+        self.hits += 1
+        return entry[1]
+
+    def count_coalesced(self):
+        """Count a caller served by a fetch already in flight, for callers coalescing on their own"""
+        with self.lock:
+            self.coalesced += 1
+
+    def put(self, url, result):
+        """Cache the (status, text) fetched for url"""
+        with self.lock:
+            self.entries.pop(url, None)
+            self.entries[url] = (time.time() + self.ttl, result)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def fetch(self, url, fetch, halted=None):
+        """Get (status, text) for url, calling fetch(url) when no fresh copy is cached.
+
+        Callers arriving while a fetch of the same URL runs wait for its
+        result (or re-raise its exception) instead of fetching again; they
+        give up and get None once halted() is true.
+        """
+        with self.lock:
+            cached = self._lookup(url)
+            if cached is not None:
+                return cached
+            flight = self.pending.get(url)
+            if flight is None:
+                flight = self.pending[url] = [threading.Event(), None]
+                leader = True
+            else:
+                self.coalesced += 1
+                leader = False
+
+        if not leader:
+            while not flight[0].wait(0.2):
+                if halted is not None and halted():
+                    return None
+            if isinstance(flight[1], Exception):
+                raise flight[1]
+            return flight[1]
+
+        try:
+            flight[1] = fetch(url)
+            self.put(url, flight[1])
+            return flight[1]
+        except Exception as e:
+            flight[1] = e
+            raise
+        finally:
+            with self.lock:
+                del self.pending[url]
+            flight[0].set()
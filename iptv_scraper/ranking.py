@@ -0,0 +1,54 @@
+"""
+Saved playlist order by measured stream quality (``--rank``).
+
+Every working link carries the metrics its probe measured
+(``validate.StreamTimer.metrics()``). What a viewer notices is how long the
+picture takes to start, which depends on both the startup latency and the
+throughput of the mirror, so links are ranked by an estimate of it: the time
+to the first byte of video plus the time to download the first
+STARTUP_BUFFER_SECONDS of the stream at the measured throughput.
+"""
+
+import math
+from collections import OrderedDict
+
+
+# Players buffer about this much video before they start playing
+STARTUP_BUFFER_SECONDS = 2
+
+# Bitrate assumed when the master playlist does not advertise one (bits/s)
+DEFAULT_BITRATE = 3000000
+
+
+def startup_time(metrics):
+    """Estimated seconds until a player starts the stream; inf when not measured"""
+    if not metrics or metrics.get('first_byte') is None or not metrics.get('throughput'):
+        return math.inf
+    bitrate = metrics.get('bitrate') or DEFAULT_BITRATE
+    return metrics['first_byte'] + bitrate * STARTUP_BUFFER_SECONDS / metrics['throughput']
+
+
+def channel_key(title):
+    """Titles differing only in case or spacing are the same channel"""
+    return ' '.join(title.lower().split())
+
+
+def rank_links(links, top_per_channel=0):
+    """Order scraped links fastest mirror first, grouped by channel.
+
+    Channels come in the order of their fastest mirror; links without
+    metrics keep their order after the measured ones. With
+    top_per_channel, only that many mirrors of each channel are kept.
+    """
+    def metrics(link):
+        return link.get('metrics') if isinstance(link, dict) else None
+
+    channels = OrderedDict()
+    for link in sorted(links, key=lambda link: startup_time(metrics(link))):
+        title = link.get('title', 'Stream') if isinstance(link, dict) else 'Stream'
+        channels.setdefault(channel_key(title), []).append(link)
+
+    ranked = []
+    for mirrors in channels.values():
+        ranked.extend(mirrors[:top_per_channel] if top_per_channel else mirrors)
+    return ranked
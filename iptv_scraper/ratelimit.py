@@ -0,0 +1,63 @@
+"""
+Per-host limits for link testing.
+
+A single playlist often lists hundreds of links on one CDN or panel. Left
+alone, every tester ends up on that host, which throttles or bans us while
+links on other hosts wait. ``HostLimiter`` caps the probes in flight per
+host and spaces them out with a token bucket; the link scheduler consults
+it and hands testers links on other hosts while one is saturated.
+"""
+
+import threading
+import time
+
+
+class HostLimiter:
+    """Concurrency cap plus token bucket rate limit, per host.
+
+    max_per_host is the number of probes allowed in flight on one host;
+    rate is probes started per second and host, with bursts of up to
+    ``burst`` (default: max_per_host). A limit of 0 disables it.
+    """
+    def __init__(self, max_per_host=8, rate=0, burst=None):
+        self.max_per_host = max_per_host
+        self.rate = rate
+        self.burst = burst or max(1, max_per_host)
+        self.lock = threading.Lock()
+        self.in_flight = {}  # host -> probes running
+        self.buckets = {}  # host -> [tokens, time of last refill]
+
+    def try_acquire(self, host, now=None):
+        """Take a slot and a token for host.
+
+        Returns 0 when the probe may start, the seconds until the next token
+        when the host is over its rate, or None when it is at its
+        concurrency cap (retry after a release()).
+        """
+        now = time.time() if now is None else now
+        with self.lock:
+            running = self.in_flight.get(host, 0)
+            if self.max_per_host and running >= self.max_per_host:
+                return None
+
+            if self.rate:
+                bucket = self.buckets.get(host)
+                if bucket is None:
+                    bucket = self.buckets[host] = [self.burst, now]
+                bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+                bucket[1] = now
+                if bucket[0] < 1:
+                    return (1 - bucket[0]) / self.rate
+                bucket[0] -= 1
+
+            self.in_flight[host] = running + 1
+            return 0
+
+    def release(self, host):
+        """Give back the slot taken for a finished probe"""
+        with self.lock:
+            running = self.in_flight.get(host, 0) - 1
+            if running > 0:
+                self.in_flight[host] = running
+            else:
+                self.in_flight.pop(host, None)
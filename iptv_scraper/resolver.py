@@ -0,0 +1,154 @@
+"""
+Process-wide DNS cache for link testing.
+
+Candidate lists hold thousands of URLs on a few hundred hosts, and many of
+the names no longer exist. Without a cache every probe asks the system
+resolver again, and a dead name can take seconds to fail each time.
+``install()`` puts a caching ``socket.getaddrinfo`` in front of the system
+one (requests and aiohttp's default resolver both go through it), names
+that do not exist are remembered as such, and ``DNSCache.prefetch()``
+resolves hosts in the background as soon as their first link is queued.
+"""
+
+import ipaddress
+import queue
+import socket
+import threading
+import time
+
+
+# getaddrinfo errors meaning the name does not exist; others (EAI_AGAIN,
+# a resolver timeout) may be temporary and are not cached
+_NO_SUCH_NAME = {socket.EAI_NONAME}
+if hasattr(socket, 'EAI_NODATA'):
+    _NO_SUCH_NAME.add(socket.EAI_NODATA)
+
+# Calls asking for anything but a plain stream lookup go to the system resolver
+_UNCACHED_FLAGS = socket.AI_PASSIVE | socket.AI_CANONNAME | socket.AI_NUMERICHOST
+
+_ADDRCONFIG = getattr(socket, 'AI_ADDRCONFIG', 0)
+
+
+def _is_ip(host):
+    try:
+        ipaddress.ip_address(host)
+        return True
+    except ValueError:
+        return False
+
+
+class DNSCache:
+    """Cache getaddrinfo() answers per host name, failures included"""
+    def __init__(self, ttl=300, negative_ttl=300, prefetch_workers=32, system_getaddrinfo=None):
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.prefetch_workers = prefetch_workers
+        self.system_getaddrinfo = system_getaddrinfo or socket.getaddrinfo
+        self.lock = threading.Lock()
+        self.entries = {}  # host -> (expires, getaddrinfo result or gaierror)
+        self.pending = {}  # host -> Event set when the lookup in flight finishes
+        self.queued = set()  # hosts waiting for a prefetch worker
+        self.todo = None  # prefetch queue, workers started on first use
+
+    def resolve(self, host):
+        """Get the answer for host, looking it up at most once at a time.
+
+        Returns the getaddrinfo() result list or the socket.gaierror it
+        raised.
+        """
+        while True:
+            with self.lock:
+                entry = self.entries.get(host)
+                if entry is not None and entry[0] > time.time():
+                    return entry[1]
+                done = self.pending.get(host)
+                if done is None:
+                    done = self.pending[host] = threading.Event()
+                    break
+            done.wait()
+
+        try:
+            try:
+                answer = self.system_getaddrinfo(host, None, 0, socket.SOCK_STREAM, 0, _ADDRCONFIG)
+                ttl = self.ttl
+            except socket.gaierror as e:
+                answer = e
+                ttl = self.negative_ttl if e.errno in _NO_SUCH_NAME else 0
+            if ttl:
+                with self.lock:
+                    self.entries[host] = (time.time() + ttl, answer)
+            return answer
+        finally:
+            with self.lock:
+                del self.pending[host]
+            done.set()
+
+    def getaddrinfo(self, host, port, family=0, type=0, proto=0, flags=0):
+        """Drop-in replacement for socket.getaddrinfo() backed by the cache"""
+        if (not isinstance(host, str) or type != socket.SOCK_STREAM or flags & _UNCACHED_FLAGS
+                or _is_ip(host) or not (port is None or isinstance(port, int) or str(port).isdigit())):
+            return self.system_getaddrinfo(host, port, family, type, proto, flags)
+
+        answer = self.resolve(host)
+        if isinstance(answer, socket.gaierror):
+            raise socket.gaierror(answer.errno, answer.strerror)
+
+        port = int(port or 0)
+        results = [
+            (addr_family, socket.SOCK_STREAM, addr_proto, '', (sockaddr[0], port) + tuple(sockaddr[2:]))
+            for addr_family, _, addr_proto, _, sockaddr in answer
+            if not family or addr_family == family
+        ]
+        if not results:
+            # None of the cached addresses is of the family asked for
+            return self.system_getaddrinfo(host, port, family, type, proto, flags)
+        return results
+
+    def is_dead(self, host):
+        """True when host is known not to exist"""
+        with self.lock:
+            entry = self.entries.get(host)
+        return entry is not None and entry[0] > time.time() and isinstance(entry[1], socket.gaierror)
+
+    def prefetch(self, host):
+        """Start resolving host in the background unless it is known or already under way"""
+        if not host or _is_ip(host):
+            return
+        with self.lock:
+            entry = self.entries.get(host)
+            if (entry is not None and entry[0] > time.time()) or host in self.pending or host in self.queued:
+                return
+            self.queued.add(host)
+            if self.todo is None:
+                self.todo = queue.Queue()
+                for _ in range(self.prefetch_workers):
+                    threading.Thread(target=self._prefetch_worker, daemon=True).start()
+        self.todo.put(host)
+
+    def _prefetch_worker(self):
+        while True:
+            host = self.todo.get()
+            try:
+                self.resolve(host)
+            except Exception:
+                pass  # Bad names (e.g. invalid IDNA) fail again, and properly, at probe time
+            finally:
+                with self.lock:
+                    self.queued.discard(host)
+
+
+_installed = None
+_install_lock = threading.Lock()
+
+
+def install():
+    """Route socket.getaddrinfo through a shared DNSCache and return it.
+
+    Only the first call installs the cache; later calls return the same one.
+    """
+    global _installed
+    with _install_lock:
+        if _installed is None:
+            _installed = DNSCache()
+            socket.getaddrinfo = _installed.getaddrinfo
+    return _installed
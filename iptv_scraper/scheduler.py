@@ -0,0 +1,244 @@
+"""
+Priority scheduling of candidate links for Phase 2.
+
+Links are tested best-first instead of in source order, so the first
+working links turn up as early as possible and likely-dead ones are left
+for last (or never reached once the target is met).
+"""
+
+import heapq
+import itertools
+import queue
+import re
+import threading
+import time
+
+
+# Links that passed the quick first pass of two-pass validation go ahead
+# of every candidate not probed yet
+SCREENED_BONUS = 100
+
+# http://1.2.3.4:8080/... style IPTV panel hosts
+_IP_HOST_RE = re.compile(r'^[a-z]+://(?:[^/@]*@)?\d{1,3}(?:\.\d{1,3}){3}(?::\d+)?/', re.IGNORECASE)
+
+
+def url_shape_score(url):
+    """Prior for a link from the shape of its URL alone (-1 worst .. +1 best)"""
+    url_lower = url.lower().split('?', 1)[0]
+    score = 0.0
+    if url_lower.endswith('.m3u8'):
+        score += 0.3  # HLS playlists from a named host are the most reliable
+    elif url_lower.endswith('.ts') and '/live/' in url_lower:
+        score -= 0.2  # Xtream-style panel links, often expired credentials
+    if _IP_HOST_RE.match(url):
+        score -= 0.3  # Bare IP:port panels come and go
+    return score
+
+
+def screened(link_data):
+    """Copy of a link that passed the quick pass, marked and ranked for the full one"""
+    return dict(link_data, screened=True, score=link_data.get('score', 0) + SCREENED_BONUS)
+
+
+class LinkScorer:
+    """Score candidate links from everything known about them so far.
+
+    Inputs are the per-domain success rates (persisted across runs), the
+    share of working links among those tested from each source this run,
+    the URL shape, the result cache and the circuit breaker.
+    """
+    def __init__(self, domain_stats, extract_domain, result_cache=None, breaker=None, level='standard'):
+        self.domain_stats = domain_stats
+        self.extract_domain = extract_domain
+        self.result_cache = result_cache
+        self.level = level  # Validation level whose cached results settle a link
+        self.breaker = breaker
+        self.lock = threading.Lock()
+        self.source_yield = {}  # source url -> [tested, working]
+
+    def record(self, source_url, ok):
+        """Count a tested link against the source it came from"""
+        if not source_url:
+            return
+        with self.lock:
+            counts = self.source_yield.setdefault(source_url, [0, 0])
+            counts[0] += 1
+            if ok:
+                counts[1] += 1
+
+    def score(self, link_data):
+        url = link_data['url']
+
+        # Known results settle without a probe; clearing them first frees the queue
+        if self.result_cache is not None and self.result_cache.get(url, self.level) is not None:
+            return 10.0
+
+        domain = self.extract_domain(url)
+        if self.breaker is not None and domain in self.breaker.opened_at:
+            return -10.0
+
+        # Smoothed success rates: unknown domains and sources start at 0.5
+        stats = self.domain_stats.get(domain) or {'success': 0, 'total': 0}
+        domain_rate = (stats['success'] + 1) / (stats['total'] + 2)
+
+        with self.lock:
+            tested, working = self.source_yield.get(link_data.get('source'), (0, 0))
+        source_rate = (working + 1) / (tested + 2)
+
+        return domain_rate + 0.5 * source_rate + url_shape_score(url)
+
+
+class LinkScheduler:
+    """Bounded priority queue of candidate links, highest score first.
+
+    Same put/get interface as ``queue.Queue`` so the pipeline can use it
+    unchanged; ties keep arrival order. With a HostLimiter, get() hands out
+    the best link whose host has room and parks links on saturated hosts
+    until done() frees a slot there or the host's rate allows another probe.
+    Every link taken with get() must be handed back with done().
+
+    put() waits while maxsize links are ready to be handed out or while
+    host_maxsize links (default: a quarter of maxsize) are parked on the
+    link's own host. Parked links do not count toward maxsize, so a
+    saturated host never blocks links for other hosts. get() parks no more
+    than host_maxsize links per host either: the rest stay ready, and
+    count toward maxsize, until the host's parked links move on.
+    """
+    def __init__(self, maxsize, score, limiter=None, host=None, host_maxsize=None):
+        self.maxsize = maxsize
+        self.host_maxsize = host_maxsize or max(1, maxsize // 4)
+        self._score = score
+        self._limiter = limiter
+        self._host = host
+        self._counter = itertools.count()
+        self._ready = []  # heap of (-score, n, link_data)
+        self._parked = {}  # host -> heap of entries waiting for that host
+        self._due = []  # heap of (time, host): rate-limited hosts to retry
+        self._timed = set()  # hosts with an entry in _due
+        self._size = 0
+        lock = threading.Lock()
+        self._not_full = threading.Condition(lock)
+        self._changed = threading.Condition(lock)
+
+    def put(self, link_data, timeout=None):
+        # Scored once; producers retry put() while the queue is full
+        if 'score' not in link_data:
+            link_data['score'] = self._score(link_data)
+        host = self._host(link_data['url']) if self._limiter is not None else None
+        with self._not_full:
+            if not self._not_full.wait_for(lambda: self._has_room(host), timeout):
+                raise queue.Full
+            heapq.heappush(self._ready, (-link_data['score'], next(self._counter), link_data))
+            self._size += 1
+            self._changed.notify()
+
+    def _has_room(self, host):
+        """True when a link for host may be put (lock held)"""
+        return len(self._ready) < self.maxsize and len(self._parked.get(host, ())) < self.host_maxsize
+
+    def requeue(self, link_data):
+        """Put a link back without waiting for room.
+
+        For testers handing back quick-pass survivors: they are the ones
+        draining the queue, so they must never block on it.
+        """
+        with self._changed:
+            heapq.heappush(self._ready, (-link_data['score'], next(self._counter), link_data))
+            self._size += 1
+            self._changed.notify()
+
+    def get(self, timeout=None):
+        deadline = None if timeout is None else time.time() + timeout
+        with self._changed:
+            while True:
+                now = time.time()
+                link_data = self._take(now)
+                if link_data is not None:
+                    return link_data
+                wake_at = self._due[0][0] if self._due else None
+                if deadline is not None:
+                    if now >= deadline:
+                        raise queue.Empty
+                    wake_at = deadline if wake_at is None else min(wake_at, deadline)
+                self._changed.wait(None if wake_at is None else wake_at - now)
+
+    def get_nowait(self):
+        with self._changed:
+            link_data = self._take(time.time())
+            if link_data is None:
+                raise queue.Empty
+            return link_data
+
+    def done(self, link_data):
+        """Release the host slot of a link returned by get()"""
+        if self._limiter is None:
+            return
+        host = self._host(link_data['url'])
+        with self._changed:
+            self._limiter.release(host)
+            if self._unpark(host):
+                self._changed.notify()
+                self._not_full.notify_all()
+
+    def pending(self):
+        """Links still waiting to be handed out, ready or parked"""
+        with self._changed:
+            return [entry[2] for entry in self._ready] + [
+                entry[2] for parked in self._parked.values() for entry in parked
+            ]
+
+    def empty(self):
+        return self._size == 0
+
+    def qsize(self):
+        return self._size
+
+    def _take(self, now):
+        """Pop the best link whose host may be probed now (lock held)"""
+        while self._due and self._due[0][0] <= now:
+            _, host = heapq.heappop(self._due)
+            self._timed.discard(host)
+            if self._unpark(host):
+                self._not_full.notify_all()
+
+        held = []  # Links of hosts whose parked list is full, back to the ready heap after
+        try:
+            while self._ready:
+                entry = heapq.heappop(self._ready)
+                link_data = entry[2]
+                if self._limiter is not None:
+                    host = self._host(link_data['url'])
+                    wait = self._limiter.try_acquire(host, now)
+                    if wait != 0:
+                        if wait is not None and host not in self._timed:
+                            heapq.heappush(self._due, (now + wait, host))
+                            self._timed.add(host)
+                        parked = self._parked.setdefault(host, [])
+                        if len(parked) >= self.host_maxsize:
+                            held.append(entry)
+                            continue
+                        heapq.heappush(parked, entry)
+                        # Room in the ready heap for links to other hosts
+                        self._not_full.notify_all()
+                        continue
+                    # The host had room; let its next waiting link compete as well
+                    if self._unpark(host):
+                        self._changed.notify()
+
+                self._size -= 1
+                self._not_full.notify_all()
+                return link_data
+            return None
+        finally:
+            for entry in held:
+                heapq.heappush(self._ready, entry)
+
+    def _unpark(self, host):
+        """Move the best link waiting for host back into the ready heap"""
+        parked = self._parked.get(host)
+        if not parked:
+            return False
+        heapq.heappush(self._ready, heapq.heappop(parked))
+        if not parked:
+            del self._parked[host]
+        return True
@@ -0,0 +1,238 @@
+"""
+Search term expansion and matching.
+
+The synonym tables are resolved once at import time into a lookup from every
+known term to its expansion, and expansions are memoized per query.
+"""
+
+from functools import lru_cache
+
+
+# Sports-related synonyms
+SPORTS_SYNONYMS = {
+    'football': ['soccer', 'futbol', 'foot', 'fifa', 'premier', 'league', 'calcio', 'fussball', 'bundesliga', 'laliga', 'serie a'],
+    'soccer': ['football', 'futbol', 'foot', 'fifa', 'premier', 'league', 'champions', 'uefa'],
+    'basketball': ['nba', 'basket', 'hoops', 'bball', 'euroleague'],
+    'nba': ['basketball', 'basket', 'hoops'],
+    'tennis': ['atp', 'wta', 'tennis channel', 'grand slam', 'wimbledon', 'us open'],
+    'boxing': ['fight', 'ufc', 'mma', 'combat', 'wrestling', 'wwe', 'aew', 'ppv'],
+    'fight': ['boxing', 'ufc', 'mma', 'combat', 'wrestling', 'bellator'],
+    'ufc': ['fight', 'mma', 'combat', 'boxing', 'bellator'],
+    'mma': ['ufc', 'fight', 'combat', 'boxing', 'bellator'],
+    'racing': ['formula', 'f1', 'nascar', 'motogp', 'motor', 'rally', 'indycar'],
+    'f1': ['formula', 'racing', 'motor', 'grand prix', 'formula 1', 'formula1'],
+    'cricket': ['ipl', 'bbl', 'cricket live', 'test cricket', 't20'],
+    'baseball': ['mlb', 'baseball live'],
+    'hockey': ['nhl', 'ice hockey'],
+    'golf': ['pga', 'masters', 'golf channel'],
+    'sport': ['sports', 'espn', 'fox sports', 'sky sports', 'bein', 'tsn', 'dazn', 'eurosport'],
+    'sports': ['sport', 'espn', 'fox sports', 'sky sports', 'bein', 'tsn', 'dazn', 'eurosport'],
+    'bein': ['bein sports', 'beinsports', 'bein sport', 'bien sports', 'bien', 'beIN', 'bein 1', 'bein 2', 'bein fr', 'bein ar', 'bein en'],
+    'beinsports': ['bein', 'bein sports', 'bein sport', 'bien sports'],
+    'espn': ['espn+', 'espn plus', 'espn deportes', 'espn2', 'espn news'],
+    'sky': ['sky sports', 'sky cinema', 'sky news', 'sky sport'],
+    'dazn': ['dazn1', 'dazn2', 'dazn sports', 'dazn live'],
+    'eurosport': ['euro sport', 'eurosport 1', 'eurosport 2'],
+    'premier': ['premier league', 'epl', 'premiership'],
+    'champions': ['champions league', 'ucl', 'uefa'],
+}
+
+# News-related synonyms
+NEWS_SYNONYMS = {
+    'news': ['noticias', 'nouvelles', 'nachrichten', 'breaking', 'live news', 'cnn', 'bbc'],
+    'cnn': ['news', 'cable news', 'breaking'],
+    'bbc': ['news', 'british', 'uk news'],
+    'aljazeera': ['al jazeera', 'jazeera', 'arabic news', 'qatar'],
+    'sky': ['sky news', 'news', 'uk'],
+}
+
+# Entertainment synonyms
+ENTERTAINMENT_SYNONYMS = {
+    'movie': ['movies', 'cinema', 'film', 'peliculas', 'filme'],
+    'movies': ['movie', 'cinema', 'film', 'peliculas', 'filme'],
+    'series': ['tv shows', 'shows', 'drama', 'serie'],
+    'kids': ['children', 'cartoon', 'disney', 'nickelodeon', 'cartoon network'],
+    'cartoon': ['kids', 'animation', 'anime', 'disney'],
+    'music': ['mtv', 'vh1', 'music video', 'concert'],
+    'documentary': ['discovery', 'national geographic', 'history', 'natgeo', 'docs'],
+    'discovery': ['documentary', 'science', 'nature', 'animal planet'],
+}
+
+# Regional/Language synonyms
+REGIONAL_SYNONYMS = {
+    'arabic': ['arab', 'عربي', 'mbc', 'osn', 'rotana', 'nile', 'saudi', 'dubai', 'aljazeera'],
+    'arab': ['arabic', 'mbc', 'osn', 'rotana', 'middle east'],
+    'tunisia': ['tunisie', 'tunisian', 'tunis', 'maghreb', 'north africa'],
+    'egypt': ['egyptian', 'cairo', 'nile', 'مصر'],
+    'morocco': ['maroc', 'moroccan', 'maghreb'],
+    'algeria': ['algerian', 'maghreb', 'dzair'],
+    'france': ['french', 'français', 'tf1', 'm6', 'canal'],
+    'uk': ['british', 'britain', 'bbc', 'itv'],
+    'usa': ['us', 'american', 'america', 'united states'],
+    'spain': ['spanish', 'español', 'espana'],
+}
+
+# Brand/Network synonyms
+NETWORK_SYNONYMS = {
+    'bein': ['bein sports', 'beinsport', 'bein sport', 'bien'],
+    'espn': ['espn+', 'espn plus', 'espn deportes'],
+    'sky': ['sky sports', 'sky cinema', 'sky news'],
+    'fox': ['fox sports', 'fox news', 'fox channel'],
+    'mbc': ['mbc1', 'mbc2', 'mbc3', 'mbc drama', 'mbc action'],
+    'osn': ['osn sports', 'osn movies', 'orbit'],
+    'dazn': ['dazn1', 'dazn2', 'dazn sports'],
+}
+
+# NSFW/Adult synonyms
+NSFW_SYNONYMS = {
+    'adult': ['xxx', '18+', 'nsfw', 'playboy', 'hustler', 'penthouse', 'venus', 'dorcel'],
+    'xxx': ['adult', '18+', 'nsfw', 'playboy', 'hustler'],
+    'nsfw': ['adult', 'xxx', '18+'],
+    '18+': ['adult', 'xxx', 'nsfw'],
+    'playboy': ['adult', 'xxx', 'hustler', 'penthouse'],
+    'venus': ['adult', 'xxx', 'dorcel'],
+}
+
+# TV Channel synonyms
+TV_CHANNEL_SYNONYMS = {
+    'tv': ['television', 'channel', 'live tv', 'broadcast'],
+    'channel': ['tv', 'television', 'live', 'broadcast'],
+    'cnn': ['news', 'cable news network', 'cnn international'],
+    'hbo': ['premium', 'movies', 'series', 'hbo max'],
+    'showtime': ['premium', 'movies'],
+    'nbc': ['network', 'broadcast'],
+    'cbs': ['network', 'broadcast'],
+    'abc': ['network', 'broadcast'],
+    'fox': ['network', 'broadcast', 'fox news'],
+    'mtv': ['music', 'music television'],
+    'comedy': ['comedy central', 'standup'],
+    'hgtv': ['home', 'garden', 'diy'],
+    'food': ['food network', 'cooking'],
+    'tlc': ['learning', 'reality'],
+    'lifetime': ['movies', 'drama'],
+    'syfy': ['sci-fi', 'science fiction'],
+    'cartoon': ['cartoon network', 'cn', 'cartoons', 'toon', 'boomerang'],
+    'disney': ['disney channel', 'disney+', 'disney junior', 'disney xd'],
+    'nickelodeon': ['nick', 'nick jr', 'nicktoons'],
+    'discovery': ['discovery channel', 'discovery+', 'science', 'tlc'],
+    'natgeo': ['national geographic', 'nat geo', 'nat geo wild'],
+    'history': ['history channel', 'h2'],
+    'amc': ['amc network', 'walking dead'],
+    'fx': ['fxx', 'fxm'],
+    'tnt': ['tbs', 'tru tv'],
+    'usa': ['usa network'],
+    'bravo': ['bravo tv'],
+    'e!': ['e entertainment'],
+    'travel': ['travel channel'],
+    'animal': ['animal planet'],
+    'paramount': ['paramount network', 'paramount+'],
+    'peacock': ['nbc peacock'],
+    'hulu': ['hulu live'],
+    'netflix': ['netflix channel'],
+}
+
+# Combine all synonym dictionaries
+ALL_SYNONYMS = {
+    **SPORTS_SYNONYMS,
+    **NEWS_SYNONYMS,
+    **ENTERTAINMENT_SYNONYMS,
+    **REGIONAL_SYNONYMS,
+    **NETWORK_SYNONYMS,
+    **NSFW_SYNONYMS,
+    **TV_CHANNEL_SYNONYMS
+}
+
+
+def _expand_by_scan(query):
+    """Expand a normalized query by walking the synonym table in order.
+
+    The first key equal to (or containing) the query wins; otherwise the first
+    key listing the query as a synonym brings in the key and its siblings.
+    """
+    expanded_terms = [query]
+
+    for key, synonyms in ALL_SYNONYMS.items():
+        if query == key or query in key:
+            expanded_terms.extend(synonyms)
+            break
+        elif query in synonyms:
+            expanded_terms.append(key)
+            expanded_terms.extend([s for s in synonyms if s != query])
+            break
+
+    # Remove duplicates while preserving order
+    return tuple(dict.fromkeys(expanded_terms))
+
+
+# Every key and synonym resolved up front; only queries that are neither
+# (e.g. "spor", a fragment of a key) still need the table walk
+_EXPANSIONS = {}
+for _key, _synonyms in ALL_SYNONYMS.items():
+    for _term in [_key] + _synonyms:
+        _term = _term.lower()
+        if _term not in _EXPANSIONS:
+            _EXPANSIONS[_term] = _expand_by_scan(_term)
+del _key, _synonyms, _term
+
+
+@lru_cache(maxsize=4096)
+def _expand(query):
+    expansion = _EXPANSIONS.get(query)
+    if expansion is None:
+        expansion = _expand_by_scan(query)
+    return expansion
+
+
+def expand_search_terms(query):
+    """Expand search query with related terms and synonyms"""
+    if not query:
+        return []
+    return list(_expand(' '.join(query.lower().split())))
+
+
+class TermMatcher:
+    """Match text against a set of search terms, built once per query.
+
+    Terms containing another term are dropped (anything matching "sky sports"
+    already matches "sport"). ``matches()`` tests a single entry, while
+    ``hits()`` finds every term in a whole block of lowercase playlist text
+    so lines without a hit never reach Python code.
+    """
+    def __init__(self, terms):
+        unique_terms = sorted({term.lower() for term in terms}, key=len)
+        self.match_all = not unique_terms or '' in unique_terms
+        self.all_terms = [term for term in unique_terms if term]
+
+        self.terms = []
+        for term in unique_terms:
+            if not any(kept in term for kept in self.terms):
+                self.terms.append(term)
+
+    def hits(self, text):
+        """Sorted offsets of every occurrence of a term in lowercase text.
+
+        One str.find() sweep per term, rather than a single pass with a
+        regex alternation: re has no multi-literal search, so the
+        alternation is tried at every offset starting with one of the
+        terms' first letters, and with more than one term it is about twice
+        as slow (benchmarks/bench_matcher.py shows both).
+        """
+        find = text.find
+        offsets = []
+        for term in self.terms:
+            offset = find(term)
+            while offset != -1:
+                offsets.append(offset)
+                offset = find(term, offset + 1)
+        offsets.sort()
+        return offsets
+
+    def matches(self, text):
+        """True when the text contains any of the terms"""
+        if self.match_all:
+            return True
+        text = text.lower()
+        for term in self.terms:
+            if term in text:
+                return True
+        return False
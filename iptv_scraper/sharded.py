@@ -0,0 +1,75 @@
+"""
+Lock-striped structures for state shared by the link testers.
+
+Dozens of testers (and the source threads feeding them) claim links and bump
+counters at the same time. A single lock around a set makes every claim wait
+for every other; no lock lets two threads claim the same link between the
+membership test and the insert. ``ShardedSet`` spreads items over
+independently locked shards so the check-and-insert is atomic yet rarely
+contended, and ``ShardedCounter`` gives each thread its own slot to add to.
+"""
+
+import itertools
+import threading
+
+
+class ShardedSet:
+    """Set whose check-and-insert is atomic, with one lock per shard"""
+    def __init__(self, shards=64):
+        self.shards = [set() for _ in range(shards)]
+        self.locks = [threading.Lock() for _ in range(shards)]
+
+    def _shard(self, item):
+        return hash(item) % len(self.shards)
+
+    def add_new(self, item):
+        """Add item; True if it was not in the set, False if someone else added it first"""
+        index = self._shard(item)
+        shard = self.shards[index]
+        with self.locks[index]:
+            if item in shard:
+                return False
+            shard.add(item)
+            return True
+
+    def add(self, item):
+        self.add_new(item)
+
+    def discard(self, item):
+        index = self._shard(item)
+        with self.locks[index]:
+            self.shards[index].discard(item)
+
+    def __contains__(self, item):
+        # A single set lookup is atomic; the shard lock is only needed to change it
+        return item in self.shards[self._shard(item)]
+
+    def __len__(self):
+        return sum(len(shard) for shard in self.shards)
+
+    def __iter__(self):
+        for index, shard in enumerate(self.shards):
+            with self.locks[index]:
+                items = list(shard)
+            for item in items:
+                yield item
+
+
+class ShardedCounter:
+    """Counter that threads add to in their own slot; reading sums the slots"""
+    def __init__(self, shards=16):
+        self.slots = [0] * shards
+        self.locks = [threading.Lock() for _ in range(shards)]
+        self.local = threading.local()
+        self.next_slot = itertools.count()  # Slots are handed to threads round-robin
+
+    def add(self, amount=1):
+        index = getattr(self.local, 'slot', None)
+        if index is None:
+            index = self.local.slot = next(self.next_slot) % len(self.slots)
+        with self.locks[index]:
+            self.slots[index] += amount
+
+    @property
+    def value(self):
+        return sum(self.slots)
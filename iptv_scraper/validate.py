@@ -0,0 +1,384 @@
+"""
+Stream validation rules shared by the link testing engines.
+
+Nothing here does I/O: each function judges data an engine has already
+read, so the thread tester (``IPTVScraper.test_iptv_link``) and the asyncio
+tester (``iptv_scraper.aio``) accept and reject exactly the same links.
+"""
+
+import re
+import time
+from urllib.parse import urljoin
+
+# Validation levels: 'quick' checks the status and the playlist header only,
+# 'standard' also fetches and checks a segment, 'deep' also reloads a live
+# playlist to see it advance
+LEVELS = ('quick', 'standard', 'deep')
+
+# Request headers used for every probe (streams are checked the way a player would)
+STREAM_HEADERS = {
+    'User-Agent': 'VLC/3.0.18 LibVLC/3.0.18',
+    'Accept': '*/*',
+    'Accept-Encoding': 'gzip, deflate',
+    'Connection': 'keep-alive'
+}
+
+# Wall-clock limit for one probe, all of its requests together (seconds).
+# Request timeouts only bound each connect and read, so a server dripping
+# bytes could otherwise hold a tester for much longer
+PROBE_DEADLINE = 15
+
+# Deep validation waits up to this long per reload, two reloads at most,
+# on top of PROBE_DEADLINE
+RELOAD_WAIT_MAX = 6
+
+# How much of a playlist a quick probe reads
+QUICK_PROBE_BYTES = 4096
+
+# Responses announcing fewer bytes than this are placeholders
+MIN_CONTENT_LENGTH = 500
+
+# How much of a playlist is read to validate it
+PLAYLIST_PROBE_BYTES = 32768
+
+# Segments are read in chunks of this size; two chunks at most
+SEGMENT_CHUNK_BYTES = 16384
+SEGMENT_PROBE_BYTES = 2 * SEGMENT_CHUNK_BYTES
+SEGMENT_MIN_BYTES = 16384
+
+# SegmentInspector reads this much at a time and stops as soon as it is
+# sure: MPEG-TS after this many packets in sync, fMP4 at its first media box
+SEGMENT_READ_STEP = 4096
+TS_PACKET_SIZE = 188
+TS_CONFIRM_PACKETS = 40
+
+# Box types found at the top level of fMP4 init and media segments
+FMP4_BOX_TYPES = frozenset([
+    b'ftyp', b'styp', b'moov', b'moof', b'mdat', b'sidx', b'ssix',
+    b'emsg', b'prft', b'free', b'skip', b'uuid'
+])
+FMP4_MEDIA_BOXES = frozenset([b'moov', b'moof', b'mdat'])
+
+# With ranking on, a working segment is read on to this many bytes so its
+# throughput is measured over more than the first packets
+THROUGHPUT_PROBE_BYTES = 131072
+
+# Direct streams: three chunks are read and 32KB must arrive
+DIRECT_STREAM_PROBE_BYTES = 3 * SEGMENT_CHUNK_BYTES
+DIRECT_STREAM_MIN_BYTES = 32768
+
+# Text found in playlists served by dead or blocked streams
+ERROR_INDICATORS = [
+    'not found',
+    '404',
+    'error',
+    'forbidden',
+    'access denied',
+    'moose_na',  # Known placeholder
+    'unavailable',
+    'offline',
+    'geo-block',
+    'restricted'
+]
+
+# A playlist needs at least one of these to describe a stream
+PLAYLIST_TAGS = [
+    '#EXT-X-STREAM-INF',
+    '#EXTINF:',
+    '#EXT-X-TARGETDURATION'
+]
+
+_ATTRIBUTE_RE = re.compile(r'([A-Z0-9-]+)=("[^"]*"|[^,]*)')
+_TARGET_DURATION_RE = re.compile(r'#EXT-X-TARGETDURATION:\s*(\d+(?:\.\d+)?)')
+_MEDIA_SEQUENCE_RE = re.compile(r'#EXT-X-MEDIA-SEQUENCE:\s*(\d+)')
+
+
+def too_small(content_length):
+    """True when a Content-Length header announces a placeholder body"""
+    content_length = content_length or '0'
+    return content_length.isdigit() and int(content_length) < MIN_CONTENT_LENGTH
+
+
+def _path(url):
+    return url.split('?', 1)[0].split('#', 1)[0]
+
+
+def is_playlist_url(url):
+    """True when a URL names an M3U/M3U8 playlist (query string ignored)"""
+    return _path(url).endswith(('.m3u8', '.m3u'))
+
+
+def is_playlist(link, content_type):
+    """True when a response should be validated as an M3U/M3U8 playlist"""
+    return is_playlist_url(link) or 'mpegurl' in content_type
+
+
+def is_direct_stream(content_type):
+    """True when a response looks like raw video data"""
+    return 'video' in content_type or 'stream' in content_type or 'octet-stream' in content_type
+
+
+def has_error_indicator(text):
+    text = text.lower()
+    return any(indicator in text for indicator in ERROR_INDICATORS)
+
+
+def playlist_header_ok(content):
+    """Quick check of the start of a playlist: M3U header, a stream tag, no error text"""
+    return ('#EXTM3U' in content and any(tag in content for tag in PLAYLIST_TAGS)
+            and not has_error_indicator(content))
+
+
+def playlist_stream_urls(link, content):
+    """Get the stream URLs listed by a playlist, or None if it is not a usable playlist"""
+    if has_error_indicator(content):
+        return None
+
+    # Must have M3U header and a valid M3U8 tag
+    if '#EXTM3U' not in content:
+        return None
+    if not any(tag in content for tag in PLAYLIST_TAGS):
+        return None
+
+    stream_urls = []
+    for line in content.split('\n'):
+        line = line.strip()
+        # Look for actual stream URLs
+        if line and not line.startswith('#'):
+            if line.startswith('http'):
+                stream_urls.append(line)
+            elif _path(line).endswith(('.ts', '.m4s', '.m3u8')):
+                # Relative URL, resolved against the playlist's own URL
+                stream_urls.append(urljoin(link, line))
+
+    return stream_urls or None
+
+
+def parse_attributes(text):
+    """Parse an HLS attribute list (BANDWIDTH=800000,CODECS="a,b") into a dict"""
+    return {name: value.strip('"') for name, value in _ATTRIBUTE_RE.findall(text)}
+
+
+def playlist_variants(link, content):
+    """Get the variant streams listed by a master playlist, lowest bandwidth first.
+
+    Each variant is a dict with 'url', 'bandwidth' (bits/s, None when not
+    given) and 'resolution' ('1280x720' or None). A media playlist has none.
+    """
+    variants = []
+    attributes = None
+    for line in content.split('\n'):
+        line = line.strip()
+        if line.startswith('#EXT-X-STREAM-INF:'):
+            attributes = parse_attributes(line[len('#EXT-X-STREAM-INF:'):])
+        elif line and not line.startswith('#') and attributes is not None:
+            bandwidth = attributes.get('BANDWIDTH', '')
+            variants.append({
+                'url': urljoin(link, line),
+                'bandwidth': int(bandwidth) if bandwidth.isdigit() else None,
+                'resolution': attributes.get('RESOLUTION'),
+            })
+            attributes = None
+
+    variants.sort(key=lambda variant: variant['bandwidth'] if variant['bandwidth'] is not None else float('inf'))
+    return variants
+
+
+def nested_segment_url(playlist_url, content):
+    """Get the first segment of a nested (media) playlist, or None to reject it"""
+    if has_error_indicator(content):
+        return None
+
+    segment_url = playlist_url
+    for line in content.split('\n'):
+        line = line.strip()
+        if line and not line.startswith('#'):
+            segment_url = urljoin(playlist_url, line)
+            break
+
+    # If still .m3u8, reject (too many nested levels)
+    if is_playlist_url(segment_url):
+        return None
+    return segment_url
+
+
+def segment_content_type_ok(content_type):
+    """Segments should be video or stream data, not text/html"""
+    return 'text/html' not in content_type and 'text/plain' not in content_type
+
+
+class StreamTimer:
+    """Timestamps of one probe, turned into the quality metrics of a working link.
+
+    Engines call response() when the link's own headers arrive,
+    data_response() when those of the segment (or direct stream) do, and
+    data() after every read of stream data.
+    """
+    def __init__(self):
+        self.started = time.time()
+        self.response_at = None
+        self.data_response_at = None
+        self.first_data_at = None
+        self.last_data_at = None
+        self.received = 0
+
+    def response(self):
+        self.response_at = time.time()
+
+    def data_response(self):
+        self.data_response_at = time.time()
+
+    def data(self, count):
+        if count:
+            now = time.time()
+            if self.first_data_at is None:
+                self.first_data_at = now
+            self.last_data_at = now
+            self.received += count
+
+    def metrics(self, bitrate=None):
+        """Get the metrics kept on the result.
+
+        'ttfb' (until the link's response headers) and 'first_byte' (until
+        the first byte of video) are seconds from the start of the probe;
+        'throughput' (measured while reading video) and 'bitrate' (as
+        advertised by the master playlist) are bits per second. Values not
+        measured are None.
+        """
+        def since_start(at):
+            return None if at is None else round(at - self.started, 3)
+
+        throughput = None
+        if self.received and self.data_response_at is not None:
+            throughput = int(self.received * 8 / max(self.last_data_at - self.data_response_at, 0.001))
+        return {
+            'ttfb': since_start(self.response_at),
+            'first_byte': since_start(self.first_data_at),
+            'throughput': throughput,
+            'bitrate': bitrate,
+        }
+
+
+class SegmentInspector:
+    """Judge a media segment from its first bytes while they are read.
+
+    Data goes straight into a preallocated buffer: read into the
+    memoryview returned by space() (``readinto``), then report the byte
+    count to feed(). MPEG-TS must have its 0x47 sync byte at every 188-byte
+    packet boundary and fMP4 (.m4s/.mp4) must be a chain of well-formed
+    boxes up to a media box; anything else is accepted once
+    SEGMENT_MIN_BYTES have arrived, unless it is markup.
+    """
+    def __init__(self, segment_url):
+        path = segment_url.split('?', 1)[0].lower()
+        if path.endswith('.ts'):
+            self.expected = 'ts'
+        elif path.endswith(('.m4s', '.mp4', '.cmfv', '.cmfa')):
+            self.expected = 'mp4'
+        else:
+            self.expected = None
+        self.buffer = bytearray(SEGMENT_PROBE_BYTES)
+        self.view = memoryview(self.buffer)
+        self.filled = 0
+        self.kind = None  # 'ts', 'mp4' or 'other' once sniffed
+        self.checked = 0  # TS: next packet to check; fMP4: next box header
+
+    def space(self):
+        """Writable view of the buffer for the next read"""
+        return self.view[self.filled:self.filled + SEGMENT_READ_STEP]
+
+    def feed(self, count):
+        """Account for count bytes read into space(); 0 means end of data.
+
+        Returns None while more data is needed, else (ok, reason).
+        """
+        self.filled += count
+        at_end = count == 0 or self.filled >= len(self.buffer)
+        if not self.filled:
+            return (False, 'segment-short') if at_end else None
+
+        if self.kind is None:
+            self.kind = self._sniff(at_end)
+            if self.kind is None:
+                return None
+            if self.expected and self.kind != self.expected:
+                return False, 'segment-bad-data'
+
+        if self.kind == 'ts':
+            verdict = self._check_ts()
+        elif self.kind == 'mp4':
+            verdict = self._check_mp4(at_end)
+        elif self.buffer[:self.filled].lstrip()[:1] == b'<':
+            verdict = False, 'segment-bad-data'  # An HTML or XML error page
+        else:
+            verdict = (True, 'ok') if self.filled >= SEGMENT_MIN_BYTES else None
+
+        if verdict is None and at_end:
+            return False, 'segment-short'
+        return verdict
+
+    def _sniff(self, at_end):
+        if self.filled and self.buffer[0] == 0x47:
+            return 'ts'
+        if self.filled < 8:
+            return 'other' if at_end else None
+        if bytes(self.buffer[4:8]) in FMP4_BOX_TYPES:
+            return 'mp4'
+        return 'other'
+
+    def _check_ts(self):
+        packets = self.buffer[self.checked:self.filled:TS_PACKET_SIZE]
+        if packets.count(0x47) != len(packets):
+            return False, 'segment-bad-data'
+        self.checked += len(packets) * TS_PACKET_SIZE
+        if self.checked // TS_PACKET_SIZE >= TS_CONFIRM_PACKETS:
+            return True, 'ok'
+        return None
+
+    def _check_mp4(self, at_end):
+        while self.checked + 8 <= self.filled:
+            offset = self.checked
+            size = int.from_bytes(self.buffer[offset:offset + 4], 'big')
+            box_type = bytes(self.buffer[offset + 4:offset + 8])
+            if box_type not in FMP4_BOX_TYPES:
+                return False, 'segment-bad-data'
+            if box_type in FMP4_MEDIA_BOXES:
+                return True, 'ok'
+            if size == 1:
+                # 64-bit size follows the type
+                if offset + 16 > self.filled:
+                    break
+                size = int.from_bytes(self.buffer[offset + 8:offset + 16], 'big')
+            if size < 8:
+                return False, 'segment-bad-data'
+            self.checked = offset + size
+        if self.checked >= len(self.buffer):
+            # Well-formed boxes larger than the probe: trust the chain so far
+            return True, 'ok'
+        return None
+
+
+def reload_delay(content):
+    """Seconds to wait before reloading a live media playlist"""
+    match = _TARGET_DURATION_RE.search(content)
+    duration = float(match.group(1)) if match else RELOAD_WAIT_MAX
+    return min(max(duration, 1), RELOAD_WAIT_MAX)
+
+
+def is_live_playlist(content):
+    """False for a playlist with an end tag (VOD or an ended event)"""
+    return '#EXT-X-ENDLIST' not in content
+
+
+def playlist_advanced(before, after):
+    """True when a reloaded media playlist moved on: a higher media sequence or new segments"""
+    sequence_before = _MEDIA_SEQUENCE_RE.search(before)
+    sequence_after = _MEDIA_SEQUENCE_RE.search(after)
+    if sequence_before and sequence_after and int(sequence_after.group(1)) > int(sequence_before.group(1)):
+        return True
+
+    def segments(content):
+        return [line.strip() for line in content.split('\n') if line.strip() and not line.startswith('#')]
+
+    segments_after = segments(after)
+    return bool(segments_after) and segments_after != segments(before)
@@ -39,6 +39,12 @@ setup(
         "colorama>=0.4.0",
         "art>=5.0",
     ],
+    extras_require={
+        # Faster HTML parsing for the web scrapers
+        "fast": ["lxml>=4.0"],
+        # asyncio link testing engine (--engine async)
+        "async": ["aiohttp>=3.7"],
+    },
     entry_points={
         "console_scripts": [
             "iptv-scraper=iptv_scraper.cli:main",
@@ -0,0 +1,36 @@
+"""
+Golden test for the single-pass stream URL scanner.
+
+fixtures/stream_urls.json holds 400 texts (a few page snippets and
+randomized fragments of URLs, hosts, paths and delimiters) with the URLs
+the 11-regex implementation of extract_urls_from_text() found in each, as
+it was before find_stream_urls() replaced it.
+"""
+
+import json
+import os
+import re
+
+from iptv_scraper.extract import STREAM_URL_PATTERNS, find_stream_urls
+
+
+FIXTURE = os.path.join(os.path.dirname(__file__), 'fixtures', 'stream_urls.json')
+
+
+def load_cases():
+    with open(FIXTURE, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def test_matches_the_regex_implementation():
+    for case in load_cases():
+        assert sorted(set(find_stream_urls(case['text']))) == case['urls'], case['text']
+
+
+def test_same_as_findall_per_pattern():
+    for case in load_cases():
+        expected = set()
+        for pattern, _ in STREAM_URL_PATTERNS:
+            expected.update(re.findall(pattern, case['text'], re.IGNORECASE))
+        expected = {url for url in expected if url.startswith('http') and len(url) > 15}
+        assert set(find_stream_urls(case['text'])) == expected, case['text']
@@ -0,0 +1,68 @@
+"""
+Threaded checks that every link is claimed exactly once.
+
+Each thread tries to claim every item, all starting together behind a
+barrier, with a tiny switch interval so the threads interleave between
+the membership test and the insert as often as possible.
+"""
+
+import collections
+import sys
+import threading
+
+import pytest
+
+from iptv_scraper.bloom import CompactURLSet
+from iptv_scraper.cli import IPTVScraper
+from iptv_scraper.sharded import ShardedCounter, ShardedSet
+
+
+THREADS = 16
+URLS = ['http://h%d.example.tv/live/%d/index.m3u8' % (i % 50, i) for i in range(2000)]
+
+
+def claim_from_threads(claim):
+    """Run claim(url) for every URL on every thread; count the True results per URL"""
+    wins = collections.Counter()
+    wins_lock = threading.Lock()
+    barrier = threading.Barrier(THREADS)
+
+    def worker():
+        barrier.wait()
+        mine = [url for url in URLS if claim(url)]
+        with wins_lock:
+            wins.update(mine)
+
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    try:
+        threads = [threading.Thread(target=worker) for _ in range(THREADS)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        sys.setswitchinterval(interval)
+    return wins
+
+
+@pytest.mark.parametrize('make_set', [ShardedSet, lambda: CompactURLSet(capacity=len(URLS))])
+def test_add_new_exactly_once(make_set):
+    seen = make_set()
+    wins = claim_from_threads(seen.add_new)
+    assert sorted(wins) == sorted(URLS)
+    assert set(wins.values()) == {1}
+    assert len(seen) == len(URLS)
+
+
+def test_claim_link_exactly_once():
+    scraper = IPTVScraper(use_cache=False, dns_cache=False)
+    wins = claim_from_threads(scraper._claim_link)
+    assert sorted(wins) == sorted(URLS)
+    assert set(wins.values()) == {1}
+
+
+def test_counter_sums_every_thread():
+    counter = ShardedCounter()
+    claim_from_threads(lambda url: counter.add() or False)
+    assert counter.value == THREADS * len(URLS)